@@ -0,0 +1,231 @@
+"""
+Compare hybrids against the equivalent hand-written Django queries.
+
+    python benchmarks/run_benchmarks.py --sizes 10000 100000 1000000 --output results.json
+    python benchmarks/run_benchmarks.py --compare results.json
+
+Every case is timed in two phases, `build` (queryset construction and SQL
+compilation, no database access) and `total` (build plus fetching the
+first `--limit` rows), and the peak allocations of one `total` run are
+measured with tracemalloc.
+"""
+import argparse, json, os, platform, random, sqlite3, statistics, sys, time, tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            }
+        },
+        INSTALLED_APPS=(
+            'django.contrib.contenttypes',
+            'django_orm_hybrid',
+            'tests',
+        ),
+        DEFAULT_AUTO_FIELD='django.db.models.AutoField',
+        USE_TZ=True,
+    )
+    django.setup()
+
+from django.db import connection, models
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat
+
+from django_orm_hybrid.models import QQ
+from tests.models import Exam, Person, Profile
+
+FIRST_NAMES = ['Lautaro', 'Gabriel', 'Ana', 'Lucia', 'Martin', 'Sofia', 'Juan', 'Valentina']
+LAST_NAMES = ['Redbear', 'Smith', 'Lopez', 'Garcia', 'Fernandez', 'Perez', 'Gomez', 'Diaz']
+
+
+def seed(size: int, batch_size: int = 10000) -> None:
+    """Fill Person and Profile with `size` rows each, deterministically."""
+    # Without the cascade collector, it would fetch every row first.
+    for model in (Exam, Profile, Person):
+        model.objects.all()._raw_delete(connection.alias)
+    rng = random.Random(size)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    for offset in range(0, size, batch_size):
+        people = Person.objects.bulk_create([
+            Person(
+                first_note=rng.randint(0, 10),
+                second_note=rng.randint(0, 10),
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                datetime=start + timedelta(minutes=rng.randint(0, 10 ** 6)),
+            )
+            for _ in range(offset, min(offset + batch_size, size))
+        ])
+        Profile.objects.bulk_create([Profile(person=person, age=rng.randint(1, 100)) for person in people])
+
+
+def _total_notes(through: str = '') -> Any:
+    return F(f'{through}first_note') + F(f'{through}second_note')
+
+
+def _full_name() -> Any:
+    return Concat('first_name', Value(' '), 'last_name')
+
+
+# case -> (hybrid, hand-written), each returning an unevaluated queryset
+QUERY_CASES: Dict[str, Dict[str, Callable[[], models.QuerySet]]] = {
+    'filter': {
+        'hybrid': lambda: Person.objects.filter(Person.total_notes() > 15),
+        'django': lambda: Person.objects.alias(total_notes=_total_notes()).filter(total_notes__gt=15),
+    },
+    'exclude': {
+        'hybrid': lambda: Person.objects.exclude(Person.total_notes() > 5),
+        'django': lambda: Person.objects.alias(total_notes=_total_notes()).exclude(total_notes__gt=5),
+    },
+    'annotate': {
+        'hybrid': lambda: Person.objects.annotate(Person.full_name(), Person.total_notes()),
+        'django': lambda: Person.objects.annotate(full_name=_full_name(), total_notes=_total_notes()),
+    },
+    'filter_iexact': {
+        'hybrid': lambda: Person.objects.filter(Person.full_name().iexact('ana lopez')),
+        'django': lambda: Person.objects.alias(full_name=_full_name()).filter(full_name__iexact='ana lopez'),
+    },
+    'qq': {
+        'hybrid': lambda: Person.objects.filter(
+            QQ(Person.total_notes() > 15) | QQ(Person.full_name().startswith('Ana'), first_note__lt=5),
+        ),
+        'django': lambda: Person.objects.alias(total_notes=_total_notes(), full_name=_full_name()).filter(
+            Q(total_notes__gt=15) | Q(full_name__startswith='Ana', first_note__lt=5),
+        ),
+    },
+    'through': {
+        'hybrid': lambda: Profile.objects.filter(Person.total_notes(through='person') > 15, age__lt=50),
+        'django': lambda: Profile.objects.alias(total_notes=_total_notes('person__')).filter(total_notes__gt=15, age__lt=50),
+    },
+}
+
+
+def _measure(run: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> Dict[str, float]:
+    """Median and min of `repeat` runs, `setup` runs untimed before each one."""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': statistics.median(timings), 'min_ms': min(timings)}
+
+
+def _allocations(run: Callable[[], Any], setup: Optional[Callable[[], Any]] = None) -> float:
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def run_queries(size: int, repeat: int, limit: int) -> List[Dict[str, Any]]:
+    results = []
+    for case, variants in QUERY_CASES.items():
+        for variant, build in variants.items():
+            total = lambda: list(build()[:limit])
+            results.append({
+                'case': case,
+                'variant': variant,
+                'size': size,
+                'build': _measure(lambda: str(build().query), repeat),
+                'total': _measure(total, repeat),
+                'alloc_kib': _allocations(total),
+            })
+    return results
+
+
+def run_instances(size: int, repeat: int, limit: int) -> List[Dict[str, Any]]:
+    people = list(Person.objects.all()[:limit])
+
+    def forget() -> None:
+        # Instances memoize hybrid calls, time the calls rather than memo hits.
+        for person in people:
+            person.__dict__.pop('_hybrid_cache', None)
+
+    variants = {
+        'hybrid': lambda: [(person.total_notes(), person.full_name()) for person in people],
+        'django': lambda: [(person.first_note + person.second_note, f'{person.first_name} {person.last_name}') for person in people],
+    }
+    return [
+        {
+            'case': 'instance',
+            'variant': variant,
+            'size': size,
+            'total': _measure(run, repeat, forget),
+            'alloc_kib': _allocations(run, forget),
+        }
+        for variant, run in variants.items()
+    ]
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> None:
+    """Print the ratio of every median total time against a previous run to stderr."""
+    before = {(r['case'], r['variant'], r['size']): r for r in previous['results']}
+    for result in current['results']:
+        old = before.get((result['case'], result['variant'], result['size']))
+        if old is None:
+            continue
+        ratio = result['total']['median_ms'] / old['total']['median_ms']
+        print(f"{result['case']:>14} {result['variant']:>6} {result['size']:>8} {ratio:6.2f}x", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=1000, help='rows fetched per query')
+    parser.add_argument('--output', help='JSON file, stdout by default')
+    parser.add_argument('--compare', help='previous JSON results to compare against')
+    args = parser.parse_args(argv)
+
+    with connection.schema_editor() as schema_editor:
+        schema_editor.create_model(Person)
+        schema_editor.create_model(Profile)
+        schema_editor.create_model(Exam)
+
+    results = []
+    for size in args.sizes:
+        seed(size)
+        results += run_queries(size, args.repeat, args.limit)
+        results += run_instances(size, args.repeat, args.limit)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'repeat': args.repeat,
+            'limit': args.limit,
+            'created': datetime.now(timezone.utc).isoformat(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return report
+
+
+if __name__ == '__main__':
+    main()
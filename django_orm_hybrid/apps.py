@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class OrmHybridConfig(AppConfig):
+    name = 'django_orm_hybrid'
+
+    def ready(self):
+        from django_orm_hybrid.models import hybrid_registry
+        hybrid_registry.populate()
@@ -0,0 +1,130 @@
+import functools, hashlib, uuid
+from typing import Any, Iterable, Optional, Set, Tuple
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+
+# Every cached result is keyed by the generations of the models it reads,
+# a write replaces the model's generation so those keys are never hit again
+# and expire with their timeout.
+
+
+def result_cache() -> Optional[BaseCache]:
+    """The cache named by the ORM_HYBRID_RESULT_CACHE setting, None when disabled."""
+    alias = getattr(settings, 'ORM_HYBRID_RESULT_CACHE', None)
+    return caches[alias] if alias else None
+
+
+@functools.lru_cache(maxsize=1024)
+def read_models(using: str, sql: str) -> Tuple[str, ...]:
+    """Labels of the models whose table the SQL reads, subqueries included."""
+    quote_name = connections[using].ops.quote_name
+    return tuple(sorted({
+        model._meta.concrete_model._meta.label
+        for model in apps.get_models(include_auto_created=True)
+        if quote_name(model._meta.db_table) in sql
+    }))
+
+
+def result_key(cache: BaseCache, labels: Iterable[str], fingerprint: Any) -> str:
+    digest = hashlib.sha256(repr((fingerprint, _generations(cache, labels))).encode()).hexdigest()
+    return f'orm_hybrid:result:{digest}'
+
+
+def _generation_key(label: str) -> str:
+    return f'orm_hybrid:generation:{label}'
+
+
+def _generations(cache: BaseCache, labels: Iterable[str]) -> Tuple[str, ...]:
+    keys = [_generation_key(label) for label in labels]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # A fresh generation, an evicted one mustn't revive older results.
+            cache.add(key, uuid.uuid4().hex, None)
+            generations[key] = cache.get(key)
+    return tuple(generations[key] for key in keys)
+
+
+def invalidate(*models: type, using: Optional[str] = None) -> None:
+    """
+    Drop the cached results reading `models` (and the tables they inherit).
+    Inside a transaction it's done again on commit, a query run in between
+    still saw the old rows and may have cached them under the new generation.
+    """
+    cache = result_cache()
+    if cache is None:
+        return
+    labels = {
+        parent._meta.concrete_model._meta.label
+        for model in models
+        for parent in (model, *model._meta.get_parent_list())
+    }
+    _bump(cache, labels)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(functools.partial(_bump, cache, labels), using=using)
+
+
+def _bump(cache: BaseCache, labels: Iterable[str]) -> None:
+    cache.set_many({_generation_key(label): uuid.uuid4().hex for label in labels}, None)
+
+
+# Models whose deletes invalidate, the ones with an OrmManager. A post_delete
+# receiver turns off Django's fast deletes of its sender, so it's only
+# connected for them and only while the cache is enabled. Saves don't have
+# that cost and invalidate for every model, hybrids read related tables.
+_deleting_models: Set[type] = set()
+
+
+def _invalidate_sender(sender: type, using: Optional[str] = None, **kwargs: Any) -> None:
+    invalidate(sender, using=using)
+
+
+def _invalidate_deleted(sender: type, using: Optional[str] = None, **kwargs: Any) -> None:
+    # The rows the delete cascaded to, however deep, may have gone without a signal.
+    invalidate(*_related_models(sender), using=using)
+
+
+def _related_models(model: type) -> Set[type]:
+    """`model` and every model whose rows point to it, directly or through others."""
+    related, pending = {model}, [model]
+    while pending:
+        for relation in pending.pop()._meta.related_objects:
+            if relation.related_model not in related:
+                related.add(relation.related_model)
+                pending.append(relation.related_model)
+    return related
+
+
+def watch_deletes(model: type) -> None:
+    """Invalidate the results reading `model` when one of its instances is deleted."""
+    _deleting_models.add(model)
+    if result_cache() is not None:
+        post_delete.connect(_invalidate_deleted, sender=model, dispatch_uid='orm_hybrid_result_cache')
+
+
+def _connect_signals(enabled: bool) -> None:
+    for signal in (post_save, m2m_changed):
+        if enabled:
+            signal.connect(_invalidate_sender, dispatch_uid='orm_hybrid_result_cache')
+        else:
+            signal.disconnect(dispatch_uid='orm_hybrid_result_cache')
+    for model in _deleting_models:
+        if enabled:
+            post_delete.connect(_invalidate_deleted, sender=model, dispatch_uid='orm_hybrid_result_cache')
+        else:
+            post_delete.disconnect(sender=model, dispatch_uid='orm_hybrid_result_cache')
+
+
+_connect_signals(result_cache() is not None)
+
+
+@receiver(setting_changed)
+def _toggle_result_cache(*, setting: str, value: Any, **kwargs: Any) -> None:
+    if setting == 'ORM_HYBRID_RESULT_CACHE':
+        _connect_signals(bool(value))
@@ -0,0 +1,30 @@
+import csv
+from typing import IO, Iterable, Optional, Sequence, Tuple
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def write_csv(rows: Iterable[Tuple], file: IO[str], header: Optional[Sequence[str]] = None) -> int:
+    """
+    Write named tuples, e.g. from HybridQuerySet.stream(), as CSV one row at
+    a time. The header defaults to the fields of the first row. Return the
+    number of rows written.
+    """
+    writer = csv.writer(file)
+    count = 0
+    for row in rows:
+        if count == 0:
+            writer.writerow(header or row._fields)
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_ndjson(rows: Iterable[Tuple], file: IO[str]) -> int:
+    """Write named tuples as one JSON object per line, return the number of rows written."""
+    encoder = DjangoJSONEncoder()
+    count = 0
+    for row in rows:
+        file.write(encoder.encode(row._asdict()))
+        file.write('\n')
+        count += 1
+    return count
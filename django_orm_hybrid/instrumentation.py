@@ -0,0 +1,102 @@
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+@dataclass
+class HybridQueryStats:
+    """
+    Accumulated timings of one hybrid (all its arguments together) in one
+    query shape (its SQL without params).
+    """
+    hybrid: str
+    sql: str
+    queries: int = 0
+    build_time: float = 0.0
+    compile_time: float = 0.0
+    execute_time: float = 0.0
+    rows: int = 0
+    # added to the last query by the hybrid, one annotation per argument set
+    annotations: int = 0
+    joins: int = 0
+
+
+class HybridRecorder:
+    """
+    Collect per hybrid and query shape stats of evaluated HybridQuerySets.
+    Disabled unless the ORM_HYBRID_INSTRUMENTATION setting is on or inside
+    `recording()`.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._stats: Dict[Tuple[str, str], HybridQueryStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def record_build(self, hybrid: str, seconds: float) -> None:
+        # Charged to the next query evaluated with the hybrid. Keyed by name,
+        # builds of querysets never fetched (count(), exists()) only add up.
+        pending = self._pending()
+        pending[hybrid] = pending.get(hybrid, 0.0) + seconds
+
+    def record_query(
+        self,
+        hybrids: List[Tuple[str, int, int]],
+        sql: str,
+        compile_time: float,
+        execute_time: float,
+        rows: int,
+    ) -> None:
+        """`hybrids` are (hybrid name, annotations, joins) of the query."""
+        pending = self._pending()
+        with self._lock:
+            for hybrid, annotations, joins in hybrids:
+                stats = self._stats.get((hybrid, sql))
+                if stats is None:
+                    stats = self._stats[hybrid, sql] = HybridQueryStats(hybrid, sql)
+                stats.queries += 1
+                stats.build_time += pending.pop(hybrid, 0.0)
+                stats.compile_time += compile_time
+                stats.execute_time += execute_time
+                stats.rows += rows
+                stats.annotations = annotations
+                stats.joins = joins
+
+    def report(self, hybrid: Optional[str] = None) -> List[HybridQueryStats]:
+        """Stats sorted by execution time, slowest first."""
+        with self._lock:
+            stats = [s for s in self._stats.values() if hybrid is None or s.hybrid == hybrid]
+        return sorted(stats, key=lambda s: s.execute_time, reverse=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+        self._pending().clear()
+
+    @contextmanager
+    def recording(self) -> Iterator['HybridRecorder']:
+        enabled, self.enabled = self.enabled, True
+        try:
+            yield self
+        finally:
+            self.enabled = enabled
+
+    def _pending(self) -> Dict[str, float]:
+        try:
+            return self._local.pending
+        except AttributeError:
+            pending = self._local.pending = {}
+            return pending
+
+
+recorder = HybridRecorder(getattr(settings, 'ORM_HYBRID_INSTRUMENTATION', False))
+
+
+@receiver(setting_changed)
+def _toggle_recorder(*, setting: str, value: bool, **kwargs) -> None:
+    if setting == 'ORM_HYBRID_INSTRUMENTATION':
+        recorder.enabled = bool(value)
@@ -0,0 +1,174 @@
+import datetime, re
+from typing import Any, Callable, Dict, List, Sequence
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Manager
+from django.db.models.constants import LOOKUP_SEP
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def _coerce(value: Any, arg: Any) -> Any:
+    """Convert a lookup argument the way the database would compare it against `value`."""
+    if isinstance(arg, str):
+        if isinstance(value, datetime.datetime):
+            parsed = parse_datetime(arg)
+            if parsed is None:
+                date = parse_date(arg)
+                parsed = datetime.datetime.combine(date, datetime.time.min) if date else None
+            if parsed is not None and timezone.is_aware(value) and timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            return arg if parsed is None else parsed
+        if isinstance(value, datetime.date):
+            return parse_date(arg) or arg
+        if isinstance(value, bool):
+            return arg
+        if isinstance(value, int):
+            try:
+                return int(arg)
+            except ValueError:
+                return arg
+        if isinstance(value, float):
+            try:
+                return float(arg)
+            except ValueError:
+                return arg
+    return arg
+
+
+def _as_text(value: Any) -> str:
+    return value if isinstance(value, str) else str(value)
+
+
+def _compare(compare: Callable[[Any, Any], bool]) -> Callable[[Any, Any], bool]:
+    def inner(value: Any, arg: Any) -> bool:
+        if value is None or arg is None:
+            return False
+        return compare(value, _coerce(value, arg))
+    return inner
+
+
+def _text(compare: Callable[[str, str], bool], ignore_case: bool = False) -> Callable[[Any, Any], bool]:
+    def inner(value: Any, arg: Any) -> bool:
+        if value is None or arg is None:
+            return False
+        value, arg = _as_text(value), _as_text(arg)
+        if ignore_case:
+            value, arg = value.lower(), arg.lower()
+        return compare(value, arg)
+    return inner
+
+
+def _exact(value: Any, arg: Any) -> bool:
+    if arg is None:
+        return value is None
+    return value is not None and value == _coerce(value, arg)
+
+
+def _in(value: Any, arg: Sequence) -> bool:
+    return value is not None and any(value == _coerce(value, item) for item in arg)
+
+
+def _range(value: Any, arg: Sequence) -> bool:
+    low, high = arg
+    return value is not None and _coerce(value, low) <= value <= _coerce(value, high)
+
+
+def _regex(flags: int = 0) -> Callable[[Any, Any], bool]:
+    def inner(value: Any, arg: Any) -> bool:
+        return value is not None and re.search(_as_text(arg), _as_text(value), flags) is not None
+    return inner
+
+
+LOOKUPS: Dict[str, Callable[[Any, Any], bool]] = {
+    'exact': _exact,
+    'iexact': lambda value, arg: _exact(value, arg) if arg is None else _text(str.__eq__, True)(value, arg),
+    'gt': _compare(lambda value, arg: value > arg),
+    'gte': _compare(lambda value, arg: value >= arg),
+    'lt': _compare(lambda value, arg: value < arg),
+    'lte': _compare(lambda value, arg: value <= arg),
+    'contains': _text(lambda value, arg: arg in value),
+    'icontains': _text(lambda value, arg: arg in value, True),
+    'startswith': _text(str.startswith),
+    'istartswith': _text(str.startswith, True),
+    'endswith': _text(str.endswith),
+    'iendswith': _text(str.endswith, True),
+    'in': _in,
+    'range': _range,
+    'isnull': lambda value, arg: (value is None) == bool(arg),
+    'regex': _regex(),
+    'iregex': _regex(re.IGNORECASE),
+}
+
+
+def _local(value: Any) -> Any:
+    if isinstance(value, datetime.datetime) and settings.USE_TZ and timezone.is_aware(value):
+        return timezone.localtime(value)
+    return value
+
+
+def _date_part(name: str) -> Callable[[Any], Any]:
+    def inner(value: Any) -> Any:
+        return None if value is None else getattr(_local(value), name)
+    return inner
+
+
+TRANSFORMS: Dict[str, Callable[[Any], Any]] = {
+    'date': lambda value: value if value is None or not isinstance(value, datetime.datetime) else _local(value).date(),
+    'year': _date_part('year'),
+    'month': _date_part('month'),
+    'day': _date_part('day'),
+    'hour': _date_part('hour'),
+    'minute': _date_part('minute'),
+    'second': _date_part('second'),
+}
+
+
+def python_lookup(value: Any, lookup: str, arg: Any) -> bool:
+    """
+    Evaluate `value <lookup> arg` in Python following the database lookup
+    semantics, `lookup` may be prefixed by transforms, e.g. 'year__gte'.
+    """
+    *transforms, name = lookup.split(LOOKUP_SEP)
+    if name in TRANSFORMS:
+        transforms.append(name)
+        name = 'exact'
+    for transform in transforms:
+        if transform not in TRANSFORMS:
+            raise ValueError(f'{transform=} can\'t be evaluated in memory')
+        value = TRANSFORMS[transform](value)
+    if name not in LOOKUPS:
+        raise ValueError(f'lookup={name!r} can\'t be evaluated in memory')
+    return LOOKUPS[name](value, arg)
+
+
+def resolve_path(obj: Any, path: List[str]) -> List[Any]:
+    """
+    Follow `path` from `obj` through related objects, to-many relations fan
+    out to every related object like the JOIN a query would use.
+    """
+    targets = [obj]
+    for name in path:
+        next_targets = []
+        for target in targets:
+            if target is None:
+                continue
+            try:
+                value = target[name] if isinstance(target, dict) else getattr(target, name)
+            except ObjectDoesNotExist:
+                value = None
+            if isinstance(value, Manager):
+                next_targets.extend(value.all())
+            else:
+                next_targets.append(value)
+        targets = next_targets
+    return targets
+
+
+def split_lookup(path: str) -> List[List[str]]:
+    """Split 'person__first_name__icontains' into the attribute path and the lookup."""
+    parts = path.split(LOOKUP_SEP)
+    for index, part in enumerate(parts[1:], start=1):
+        if part in LOOKUPS or part in TRANSFORMS:
+            return [parts[:index], parts[index:]]
+    return [parts, ['exact']]
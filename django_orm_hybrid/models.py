@@ -1,86 +1,1046 @@
-import warnings, inspect, functools
-from typing import Any, Callable, Dict, List, Literal, Optional, Tuple, Union
-from django.db import models
+import inspect, functools, threading, copy, operator, dataclasses, time, sys, datetime, decimal
+from collections import OrderedDict, namedtuple
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, FrozenSet, Hashable, Iterable, Iterator, List, Literal, NamedTuple, Optional, Set, Tuple, Union
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core import checks
+from django.core.signals import setting_changed
+from django.db.models.signals import class_prepared, post_save, pre_save
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.exceptions import EmptyResultSet, ImproperlyConfigured
+from django.db import connections, models
+from django.db.backends.utils import names_digest
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import Col, Combinable, CombinedExpression
+from django.db.models.functions import Coalesce, Lower
+from django.db.models.query import ModelIterable
+from django.dispatch import receiver
+from django_orm_hybrid.cache import invalidate, read_models, result_cache, result_key, watch_deletes
+from django_orm_hybrid.instrumentation import recorder
+from django_orm_hybrid.lookups import python_lookup, resolve_path, split_lookup
 from dataclasses import dataclass, field
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-class OrmManager(models.Manager):
-    # TODO: find the way to override the default manager or assign this manager as default
-    def exclude(self, *args: Any, **kwargs: Any):
-        hybrid_expression_results: List[OrmExpressionResult] = []
-        qq_results: List[QQ] = []
-        common_filter_args = []
+# Slotted dataclasses need Python 3.10
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+class HybridModelIterable(ModelIterable):
+    """
+    Hand annotated hybrids of the queryset's own model to the instance side,
+    so calling them with the same args returns the value the database
+    computed.
+    """
+    def __iter__(self):
+        queryset = self.queryset
+        hybrids = []
+        orm_properties = _model_orm_properties(queryset.model)
+        names = {prop.name for prop in orm_properties.values()}
+        annotation_select = queryset.query.annotation_select
+        for key, alias in queryset._hybrid_aliases.items():
+            prop = orm_properties.get(key[0])
+            if prop is None or alias not in annotation_select or any(name == 'through' for name, _ in key[2]):
+                continue
+            # orm_property.__set__ parks values annotated under a hybrid's name
+            hybrids.append((alias, (prop.name, key[1], key[2]), alias in names))
+
+        for obj in super().__iter__():
+            if hybrids:
+                cache = _hybrid_cache(obj)
+                state = _instance_state(obj)
+                for alias, memo_key, parked in hybrids:
+                    value = obj.__dict__.pop(alias) if parked else obj.__dict__[alias]
+                    cache[memo_key] = value, state
+            yield obj
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    hash(value)
+    # 1, 1.0 and True hash the same but don't build the same SQL
+    return type(value), value
+
+
+class ExpressionCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class ExpressionCache:
+    """
+    Bounded LRU of built hybrid expressions, keyed like the per-query
+    expression table. Disabled while `maxsize` is 0, set it through the
+    ORM_HYBRID_EXPRESSION_CACHE_SIZE setting or `resize()`.
+    """
+    def __init__(self, maxsize: int = 0):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._expressions: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: Optional[Hashable], build: Callable[[], Any]) -> Any:
+        if not self.maxsize or key is None:
+            return build()
+        with self._lock:
+            expression = self._expressions.get(key)
+            if expression is not None:
+                self._expressions.move_to_end(key)
+                self.hits += 1
+                return expression.copy()
+            self.misses += 1
+
+        expression = build()
+        if not hasattr(expression, 'copy'):
+            return expression
+        with self._lock:
+            self._expressions[key] = expression
+            while len(self._expressions) > self.maxsize:
+                self._expressions.popitem(last=False)
+        # the cached instance never leaves the cache
+        return expression.copy()
+
+    def resize(self, maxsize: int) -> None:
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._expressions) > maxsize:
+                self._expressions.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expressions.clear()
+            self.hits = self.misses = 0
+
+    def info(self) -> ExpressionCacheInfo:
+        return ExpressionCacheInfo(self.hits, self.misses, self.maxsize, len(self._expressions))
+
+
+expression_cache = ExpressionCache(getattr(settings, 'ORM_HYBRID_EXPRESSION_CACHE_SIZE', 0))
+
+
+@receiver(setting_changed)
+def _resize_expression_cache(*, setting: str, value: Any, **kwargs: Any) -> None:
+    if setting == 'ORM_HYBRID_EXPRESSION_CACHE_SIZE':
+        expression_cache.resize(value or 0)
+
+
+def _build_expression(expr: Callable, expr_args: Tuple, expr_kwargs: Dict[str, Any]) -> Any:
+    if expr in _STORED_COLUMNS:
+        return models.F(expr_kwargs.get('through', '') + _STORED_COLUMNS[expr])
+    if not expression_cache.maxsize:
+        return expr(expr, *expr_args, **expr_kwargs)
+    return expression_cache.get_or_build(
+        _expression_key(expr, expr_args, expr_kwargs),
+        lambda: expr(expr, *expr_args, **expr_kwargs),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _through_prefix(through: str) -> str:
+    assert not through.endswith('__'), f'{through=} can\'t end with "__"'
+    assert not through.startswith('__'), f'{through=} can\'t start with "__"'
+    return f'{through}__'
+
+
+def _expression_key(expr: Callable, expr_args: Tuple, expr_kwargs: Dict[str, Any]) -> Optional[Hashable]:
+    """
+    Identify a built expression by its hybrid, args and kwargs (which include
+    `through`), or return None when some argument isn't hashable.
+    """
+    try:
+        return expr, _freeze(expr_args), _freeze(expr_kwargs)
+    except TypeError:
+        return None
+
+
+class HybridQuerySet(models.QuerySet):
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._iterable_class = HybridModelIterable
+        # (expression key) -> alias of every hybrid already added to this query
+        self._hybrid_aliases: Dict[Hashable, str] = {}
+        self._result_timeout: Any = _UNCACHED
+        # fields only_for() asked for, later only() and defer() keep them
+        self._hybrid_sources: FrozenSet[str] = frozenset()
+
+    def _clone(self) -> 'HybridQuerySet':
+        clone = super()._clone()
+        clone._hybrid_aliases = self._hybrid_aliases.copy()
+        clone._result_timeout = self._result_timeout
+        clone._hybrid_sources = self._hybrid_sources
+        return clone
+
+    def only_for(self, *hybrids: Any) -> 'HybridQuerySet':
+        """
+        Load only the fields `hybrids` (Person.full_name or
+        Person.notes_multiplication(10)) read, so calling them on the
+        instances doesn't load deferred fields.
+        """
+        if not hybrids or any(isinstance(hybrid, str) for hybrid in hybrids):
+            raise ValueError(f'{hybrids=} must be hybrids, use only() for fields')
+        return self.only(*hybrids)
+
+    def only(self, *fields: Any) -> 'HybridQuerySet':
+        names, sources = [], self._hybrid_sources
+        for field_name in fields:
+            if isinstance(field_name, str) or field_name is None:
+                names.append(field_name)
+            else:
+                sources |= self._hybrid_dependencies(field_name)
+        queryset = super().only(*names, *sorted(sources - set(names)))
+        queryset._hybrid_sources = sources
+        return queryset
+
+    def defer(self, *fields: Any) -> 'HybridQuerySet':
+        if fields == (None,):
+            return super().defer(None)
+        return super().defer(*(field_name for field_name in fields if field_name not in self._hybrid_sources))
+
+    def _hybrid_dependencies(self, hybrid: Any) -> FrozenSet[str]:
+        if isinstance(hybrid, OrmExpression):
+            expr, args, kwargs = hybrid.expr, hybrid.expr_args, hybrid.expr_kwargs
+        else:
+            expr, args, kwargs = getattr(hybrid, '__wrapped__', None), (), {}
+        prop = _model_orm_properties(self.model).get(expr)
+        if prop is None or 'through' in kwargs:
+            raise ValueError(f'{hybrid=} is not a hybrid of {self.model.__name__}')
+        dependencies = prop._dependencies(self.model, args, kwargs)
+        if dependencies is None:
+            raise ValueError(f'Can\'t tell the fields {prop.name!r} reads, pass its arguments or declare depends_on')
+        return dependencies
+
+    def cached(self, timeout: Optional[float] = DEFAULT_TIMEOUT) -> 'HybridQuerySet':
+        """
+        Serve the rows from the ORM_HYBRID_RESULT_CACHE cache for `timeout`
+        seconds, or until any model the query reads (joins and subqueries
+        included) is written. Prefetches and iterator() aren't cached.
+        Deletes are only seen on models with an OrmManager (and the rows they
+        cascade to), other models keep Django's fast deletes.
+        """
+        if result_cache() is None:
+            raise ImproperlyConfigured('Set ORM_HYBRID_RESULT_CACHE to a cache alias to use cached()')
+        if self.query.select_for_update:
+            raise ValueError('select_for_update() querysets can\'t be cached')
+        clone = self._chain()
+        clone._result_timeout = timeout
+        return clone
+
+    def exclude(self, *args: Any, **kwargs: Any) -> 'HybridQuerySet':
+        return self._filter_or_exclude_hybrid(True, args, kwargs)
+
+    def filter(self, *args: Any, **kwargs: Any) -> 'HybridQuerySet':
+        return self._filter_or_exclude_hybrid(False, args, kwargs)
+
+    def annotate(self, *args: Any, **kwargs: Any) -> 'HybridQuerySet':
+        orm_expressions = []
+        aggregates: Dict[str, Any] = {}
+        common_annotate_args = []
         for arg in args:
-            if isinstance(arg, OrmExpressionResult):
-                arg.method = 'exclude'
-                hybrid_expression_results.append(arg)
+            if isinstance(arg, OrmExpression):
+                orm_expressions.append(arg)
                 continue
-            if isinstance(arg, QQ):
-                qq_results.append(arg)
+            if isinstance(arg, OrmAggregate):
+                _check_default_alias(arg, aggregates)
+                aggregates[arg.default_alias] = self._aggregate_annotation(arg)
                 continue
-            if isinstance(arg, OrmExpression):
-                raise ValueError(f'{arg=} is not an OrmExpressionResult')
+            if isinstance(arg, OrmExpressionResult):
+                raise ValueError(f'{arg=} is not an OrmExpression')
+            common_annotate_args.append(arg)
+        kwargs = {name: self._aggregate_annotation(value) if isinstance(value, OrmAggregate) else value for name, value in kwargs.items()}
 
-            common_filter_args.append(arg)
+        queryset = self._free_default_aliases(orm_expressions)
+        hybrid_aliases, orm_expression_annotations, _ = queryset._hybrid_annotations(orm_expressions)
+        queryset = super(HybridQuerySet, queryset).annotate(*common_annotate_args, **{**orm_expression_annotations, **aggregates, **kwargs})
+        queryset._hybrid_aliases = hybrid_aliases
+        return queryset
 
-        self = super().exclude(*common_filter_args, **kwargs)
+    def aggregate(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        args, kwargs = _build_aggregates(args, kwargs)
+        return super().aggregate(*args, **kwargs)
 
-        for qq_result in qq_results:
-            for orm_expression in qq_result.orm_expression_results:
-                self = self.annotate(**orm_expression._annotate())
-        self = self.exclude(*qq_results)
+    def values(self, *fields: Any, **expressions: Any) -> 'HybridQuerySet':
+        queryset, fields = self._hybrid_fields(fields)
+        return super(HybridQuerySet, queryset._promote_aliases(fields)).values(*fields, **expressions)
 
-        for orm_expression_result in hybrid_expression_results:
-            self = orm_expression_result.apply(queryset=self)
+    def values_list(self, *fields: Any, flat: bool = False, named: bool = False) -> 'HybridQuerySet':
+        queryset, fields = self._hybrid_fields(fields)
+        return super(HybridQuerySet, queryset._promote_aliases(fields)).values_list(*fields, flat=flat, named=named)
 
-        return self
+    def order_by(self, *field_names: Any) -> 'HybridQuerySet':
+        hybrid_aliases = self._hybrid_aliases.copy()
+        annotations: Dict[str, Any] = {}
+        orderings = []
+        for field_name in field_names:
+            if isinstance(field_name, OrmExpression):
+                field_name = field_name.asc()
+            if isinstance(field_name, OrmOrdering):
+                orm_expression = field_name.orm_expression
+                if _to_many_relation(self.model, orm_expression.expr_kwargs.get('through')) is not None:
+                    raise ValueError(
+                        f'{orm_expression=} goes through a to-many relation, annotate an aggregate of it and order by '
+                        f'its alias, e.g. .annotate(<hybrid>.max()).order_by(\'-{orm_expression.alias}__max\')'
+                    )
+                alias = self._hybrid_alias(field_name.orm_expression, hybrid_aliases, annotations)
+                field_name = field_name._order_by(alias)
+            elif isinstance(field_name, OrmExpressionResult):
+                raise ValueError(f'{field_name=} is not an OrmExpression')
+            orderings.append(field_name)
+
+        queryset = super().alias(**annotations) if annotations else self
+        queryset = super(HybridQuerySet, queryset).order_by(*orderings)
+        queryset._hybrid_aliases = hybrid_aliases
+        return queryset
+
+    def paginate_after(self, last_row: Optional[Union[models.Model, Dict[str, Any]]], limit: Optional[int] = None) -> 'HybridQuerySet':
+        """
+        Keyset pagination, return the rows that follow `last_row` (an instance
+        or values() row of the previous page, None for the first page) in the
+        queryset's ordering with a seek predicate instead of OFFSET. The
+        ordering must include the primary key to be deterministic.
+        """
+        if last_row is None:
+            return self._paginate(None, limit)
+        row, missing = self._seek_row(last_row)
+        if missing:
+            row.update(self._seek_missing(row, missing).get())
+        return self._paginate(row, limit)
+
+    async def apaginate_after(self, last_row: Optional[Union[models.Model, Dict[str, Any]]], limit: Optional[int] = None) -> 'HybridQuerySet':
+        if last_row is None:
+            return self._paginate(None, limit)
+        row, missing = self._seek_row(last_row)
+        if missing:
+            row.update(await self._seek_missing(row, missing).aget())
+        return self._paginate(row, limit)
+
+    def _seek_row(self, last_row: Union[models.Model, Dict[str, Any]]) -> Tuple[Dict[str, Any], List[str]]:
+        """Return the ordering values available on `last_row` and the names missing from it."""
+        pk_name = self.model._meta.pk.name
+        names = [name for name, _ in _ordering_terms(self)]
+        if isinstance(last_row, dict):
+            row = dict(last_row)
+            row.setdefault(pk_name, row.get('pk'))
+        else:
+            row = {pk_name: last_row.pk}
+            memo_keys = self._memo_keys()
+            cache = _hybrid_cache(last_row)
+            for name in names:
+                if name in memo_keys:
+                    # The memo HybridModelIterable filled, unless the instance changed since.
+                    value, state = cache.get(memo_keys[name], (None, None))
+                    if state == _instance_state(last_row):
+                        row[name] = value
+                elif name in last_row.__dict__ or name not in self.query.annotations:
+                    row[name] = getattr(last_row, name)
+        return row, [name for name in names if name not in row]
+
+    def _memo_keys(self) -> Dict[str, Hashable]:
+        """Instance memo key of every hybrid alias of the queryset's own model."""
+        orm_properties = _model_orm_properties(self.model)
+        return {
+            alias: (orm_properties[key[0]].name, key[1], key[2])
+            for key, alias in self._hybrid_aliases.items()
+            if key[0] in orm_properties
+        }
+
+    def _seek_missing(self, row: Dict[str, Any], missing: List[str]) -> 'HybridQuerySet':
+        queryset = self.order_by()
+        queryset.query.clear_where()
+        return queryset.filter(pk=row[self.model._meta.pk.name]).values(*missing)
+
+    def _paginate(self, row: Optional[Dict[str, Any]], limit: Optional[int]) -> 'HybridQuerySet':
+        queryset = self
+        if issubclass(self._iterable_class, HybridModelIterable):
+            # Select the hybrids order_by() added with alias(), the instances
+            # memoize them and the next page reads them back from there.
+            ordering = _ordering_names(self.query)
+            queryset = self._promote_aliases(tuple(alias for alias in self._hybrid_aliases.values() if alias in ordering))
+        if row is not None:
+            terms = _ordering_terms(self)
+            values = [row[name] for name, _ in terms]
+            if any(value is None for value in values):
+                raise ValueError(f'Can\'t seek past NULL ordering values, got {dict(zip((name for name, _ in terms), values))}')
+            queryset = queryset.filter(_seek(terms, values))
+        return queryset[:limit] if limit is not None else queryset
+
+    def stream(self, *fields: Any, chunk_size: int = 2000, keyset: bool = False) -> Iterator[Tuple]:
+        """
+        Yield named tuples of `fields` (field names or hybrids) fetching
+        `chunk_size` rows at a time, with a server-side cursor where the
+        backend has them or, with `keyset=True`, one paginate_after() query
+        per chunk in the queryset's ordering (pk by default).
+        """
+        queryset, names = self._hybrid_fields(fields)
+        if not keyset:
+            yield from queryset.values_list(*names, named=True).iterator(chunk_size=chunk_size)
+            return
+
+        if not queryset.query.order_by:
+            queryset = queryset.order_by('pk')
+        ordering = [name for name, _ in _ordering_terms(queryset)]
+        rows = queryset.values(*names, *(name for name in ordering if name not in names))
+        row_class = namedtuple('Row', names, rename=True)
+        last = None
+        while True:
+            page = list(rows.paginate_after(last, chunk_size))
+            for row in page:
+                yield row_class(*(row[name] for name in names))
+            if len(page) < chunk_size:
+                return
+            last = page[-1]
+
+    async def astream(self, *fields: Any, chunk_size: int = 2000) -> AsyncIterator[Tuple]:
+        queryset, names = self._hybrid_fields(fields)
+        async for row in queryset.values_list(*names, named=True).aiterator(chunk_size=chunk_size):
+            yield row
+
+    # Async counterparts expand the hybrids in the event loop, only the
+    # database work goes through Django's own async methods.
+
+    async def aget(self, *args: Any, **kwargs: Any) -> models.Model:
+        queryset = self.filter(*args, **kwargs) if args or kwargs else self
+        return await super(HybridQuerySet, queryset).aget()
+
+    async def aaggregate(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        args, kwargs = _build_aggregates(args, kwargs)
+        return await super().aaggregate(*args, **kwargs)
+
+    async def aupdate(self, *assignments: 'OrmAssignment', **kwargs: Any) -> int:
+        return await sync_to_async(self.update)(*assignments, **kwargs)
+
+    async def aexplain_hybrid(self, **options: Any) -> str:
+        return await sync_to_async(self.explain_hybrid)(**options)
+
+    def bulk_create(self, objs: Iterable[models.Model], *args: Any, **kwargs: Any) -> List[models.Model]:
+        objs = list(objs)
+        for prop in _stored_orm_properties(self.model):
+            for obj in objs:
+                prop._store(obj)
+        objs = super().bulk_create(objs, *args, **kwargs)
+        invalidate(self.model, using=self.db)
+        return objs
+
+    def bulk_update(self, objs: Iterable[models.Model], fields: Iterable[str], *args: Any, **kwargs: Any) -> int:
+        objs, fields = list(objs), list(fields)
+        for prop in _changed_stored_orm_properties(self.model, fields):
+            for obj in objs:
+                prop._store(obj)
+            fields.append(prop.column)
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        invalidate(self.model, using=self.db)
+        return rows
 
-    def filter(self, *args: Any, **kwargs: Any) -> models.QuerySet:
-        qq_results: List[QQ] = []
-        hybrid_expression_results: List[OrmExpressionResult] = []
-        common_filter_args = []
+    def update(self, *assignments: 'OrmAssignment', **kwargs: Any) -> int:
+        for assignment in assignments:
+            if not isinstance(assignment, OrmAssignment):
+                raise ValueError(f'{assignment=} is not an OrmAssignment, use .set() on a hybrid')
+            for name, value in assignment._fields(self.model).items():
+                if name in kwargs:
+                    raise ValueError(f'{name!r} is assigned more than once')
+                kwargs[name] = value
+        columns = {}
+        for prop in _changed_stored_orm_properties(self.model, kwargs):
+            # Recompute set-based in the same UPDATE, reading the new values
+            # of the fields being written.
+            replacements = {
+                models.F(name): value if hasattr(value, 'resolve_expression') else models.Value(value, output_field=self.model._meta.get_field(name))
+                for name, value in kwargs.items()
+            }
+            columns[prop.column] = prop.expr(prop.expr).replace_expressions(replacements)
+        rows = super().update(**kwargs, **columns)
+        invalidate(self.model, using=self.db)
+        return rows
+
+    def delete(self) -> Tuple[int, Dict[str, int]]:
+        deleted, rows = super().delete()
+        # Fast deletes send no signal, invalidate every model the delete reached.
+        invalidate(self.model, *(apps.get_model(label) for label in rows), using=self.db)
+        return deleted, rows
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def explain_hybrid(self, **options: Any) -> str:
+        """
+        Return the backend's EXPLAIN of the query headed by the hybrids it
+        uses and their aliases, plan lines using a hybrid's index are marked.
+        """
+        lines = []
+        index_names: Dict[str, str] = {}
+        for key, alias in self._hybrid_aliases.items():
+            selected = 'select' if alias in self.query.annotation_select else 'alias'
+            lines.append(f'-- {alias}: {_hybrid_label(key)} [{selected}, {_hybrid_joins(self.query, alias)} joins]')
+        for prop in _model_orm_properties(self.model).values():
+            index_names[prop._index_name(self.model, 'idx')] = prop.expr.__qualname__
+            index_names[prop._index_name(self.model, 'lower')] = f'LOWER({prop.expr.__qualname__})'
+        for line in self.explain(**options).splitlines():
+            hybrids = [label for name, label in index_names.items() if name in line]
+            lines.append(f'{line}  <- {", ".join(hybrids)}' if hybrids else line)
+        return '\n'.join(lines)
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._result_timeout is not _UNCACHED:
+            self._fetch_all_cached()
+        elif self._result_cache is None and self._hybrid_aliases and recorder.enabled:
+            self._fetch_all_recorded()
+        else:
+            super()._fetch_all()
+
+    def _fetch_all_cached(self):
+        cache = result_cache()
+        try:
+            sql, params = self.query.get_compiler(self.db).as_sql()
+        except EmptyResultSet:
+            return super()._fetch_all()
+        iterable = self._iterable_class
+        fingerprint = (self.db, f'{iterable.__module__}.{iterable.__qualname__}', self._fields, sql, params)
+        key = result_key(cache, read_models(self.db, sql), fingerprint)
+        rows = cache.get(key)
+        if rows is None:
+            rows = list(self._iterable_class(self))
+            cache.set(key, rows, self._result_timeout)
+        self._result_cache = rows
+        if self._prefetch_related_lookups and not self._prefetch_done:
+            self._prefetch_related_objects()
+
+    def _fetch_all_recorded(self):
+        executed = []
+
+        def timer(execute, sql, params, many, context):
+            executed.append((sql, time.perf_counter()))
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connections[self.db].execute_wrapper(timer):
+            super()._fetch_all()
+        end = time.perf_counter()
+        if not executed:
+            return
+        sql, executed_at = executed[0]
+        hybrids: Dict[str, Tuple[int, int]] = {}
+        for key, alias in self._hybrid_aliases.items():
+            if alias in self.query.annotations:
+                name = _hybrid_name(key)
+                annotations, joins = hybrids.get(name, (0, 0))
+                hybrids[name] = annotations + 1, max(joins, _hybrid_joins(self.query, alias))
+        recorder.record_query(
+            [(name, annotations, joins) for name, (annotations, joins) in hybrids.items()],
+            sql,
+            compile_time=executed_at - start,
+            execute_time=end - executed_at,
+            rows=len(self._result_cache),
+        )
+
+    def prepare(self, build: Callable[..., models.QuerySet]) -> 'PreparedHybridQuery':
+        """
+        Return a callable running `build(queryset, *args, **kwargs)` whose SQL
+        is compiled once per database and call shape and only gets its
+        parameters rebound on later calls. `build` receives HybridParameter
+        placeholders instead of the arguments, so it can't transform them.
+        """
+        return PreparedHybridQuery(self, build)
+
+    def _hybrid_annotations(self, orm_expressions: List['OrmExpression']) -> Tuple[Dict[Hashable, str], Dict[str, Any], List[str]]:
+        """
+        Return the updated alias table, the annotations selecting every
+        hybrid of `orm_expressions` and their aliases.
+        """
+        hybrid_aliases = self._hybrid_aliases.copy()
+        annotations: Dict[str, Any] = {}
+        aliases = []
+        for orm_expression in orm_expressions:
+            if _to_many_relation(self.model, orm_expression.expr_kwargs.get('through')) is not None:
+                raise ValueError(f'{orm_expression=} goes through a to-many relation, annotate an aggregate of it like .max()')
+            alias = self._hybrid_alias(orm_expression, hybrid_aliases, annotations)
+            if alias not in annotations and alias not in self.query.annotation_select:
+                annotations[alias] = models.F(alias)
+            aliases.append(alias)
+        return hybrid_aliases, annotations, aliases
+
+    def _free_default_aliases(self, orm_expressions: List['OrmExpression']) -> 'HybridQuerySet':
+        """
+        Hand the default alias of the hybrids about to be selected over from
+        an unselected alias a filter gave another call of the same hybrid,
+        which is renamed, so the selected column gets the name asked for.
+        """
+        queryset = self
+        for orm_expression in orm_expressions:
+            query, name, key = queryset.query, orm_expression.alias, orm_expression._key()
+            if key is None or key in queryset._hybrid_aliases or name not in query.annotations or name in query.annotation_select:
+                continue
+            holders = [holder for holder, alias in queryset._hybrid_aliases.items() if alias == name]
+            if not holders:
+                continue
+            if name in _ordering_names(query):
+                raise ValueError(f'{orm_expression=} asks for the alias {name!r} the ordering uses, pass another alias')
+            if queryset is self:
+                queryset = self._chain()
+                query = queryset.query
+            alias, suffix = name, 1
+            while alias in query.annotations:
+                suffix += 1
+                alias = f'{name}_{suffix}'
+            # The filters hold the resolved expression, not the name.
+            query.annotations[alias] = query.annotations.pop(name)
+            query._annotation_select_cache = None
+            for holder in holders:
+                queryset._hybrid_aliases[holder] = alias
+        return queryset
+
+    def _hybrid_fields(self, fields: Tuple) -> Tuple['HybridQuerySet', Tuple]:
+        """Select the hybrids asked for in values(), replacing them by their alias."""
+        orm_expressions = [field_name for field_name in fields if isinstance(field_name, OrmExpression)]
+        if not orm_expressions:
+            return self, fields
+        queryset = self._free_default_aliases(orm_expressions)
+        hybrid_aliases, annotations, aliases = queryset._hybrid_annotations(orm_expressions)
+        queryset = super(HybridQuerySet, queryset).annotate(**annotations) if annotations else queryset._chain()
+        queryset._hybrid_aliases = hybrid_aliases
+        aliases = iter(aliases)
+        return queryset, tuple(next(aliases) if isinstance(field_name, OrmExpression) else field_name for field_name in fields)
+
+    def _promote_aliases(self, fields: Tuple) -> 'HybridQuerySet':
+        """
+        Hybrids used only for filtering are registered with alias(), select
+        them once the caller asks for them by name.
+        """
+        promote = {}
+        for field_name in fields:
+            if not isinstance(field_name, str):
+                continue
+            name = field_name.split(LOOKUP_SEP, 1)[0]
+            if name in self.query.annotations and name not in self.query.annotation_select:
+                promote[name] = models.F(name)
+        return super().annotate(**promote) if promote else self
+
+    def _hybrid_alias(
+        self,
+        orm_expression: Union['OrmExpression', 'OrmExpressionResult'],
+        hybrid_aliases: Dict[Hashable, str],
+        annotations: Dict[str, Any],
+    ) -> str:
+        """
+        Return the alias the expression is (or will be) available under,
+        building it only the first time it's seen in this query. Different
+        expressions asking for the same alias get a numbered suffix, an
+        expression already built under another alias is also made available
+        under the one it asks for.
+        """
+        key = orm_expression._key()
+        alias = hybrid_aliases.get(key) if key is not None else None
+        if alias is not None:
+            requested = orm_expression.alias
+            if (
+                isinstance(orm_expression, OrmExpression) and requested != alias
+                and requested not in self.query.annotations and requested not in annotations
+            ):
+                annotations[requested] = models.F(alias)
+                return requested
+            return alias
+
+        base = orm_expression.alias
+        if isinstance(orm_expression, OrmExpressionResult) and orm_expression._case_folded():
+            # The hybrid itself stays reachable under its name, e.g. for values().
+            self._hybrid_alias(dataclasses.replace(orm_expression, lookup='exact', ignore_case=False), hybrid_aliases, annotations)
+            base = f'{base}_lower'
+        alias = base
+        suffix = 1
+        while alias in self.query.annotations or alias in annotations:
+            suffix += 1
+            alias = f'{base}_{suffix}'
+        if key is not None:
+            hybrid_aliases[key] = alias
+        if recorder.enabled and key is not None:
+            start = time.perf_counter()
+            annotations[alias] = orm_expression._build()
+            recorder.record_build(_hybrid_name(key), time.perf_counter() - start)
+        else:
+            annotations[alias] = orm_expression._build()
+        return alias
+
+    def _filter_or_exclude_hybrid(self, negate: bool, args: Tuple, kwargs: Dict[str, Any]) -> 'HybridQuerySet':
+        """
+        Gather every hybrid annotation and predicate of a single filter/exclude
+        call so they are applied with one alias() and one filter() clone.
+        """
+        hybrid_aliases = self._hybrid_aliases.copy()
+        annotations: Dict[str, Any] = {}
+        conditions: List[models.Q] = []
+        qq_results: List[models.Q] = []
+        common_args = []
         for arg in args:
+            if isinstance(arg, models.Q):
+                arg = _hybrid_q(arg)
             if isinstance(arg, OrmExpressionResult):
-                arg.method = 'filter'
-                hybrid_expression_results.append(arg)
+                negated = negate == (arg.method == 'filter')
+                exists = self._to_many_exists(arg)
+                if exists is None and not negated:
+                    exists = self._hybrid_condition(arg, hybrid_aliases, annotations)
+                if exists is not None:
+                    conditions.append(~models.Q(exists) if negated else models.Q(exists))
+                    continue
+                _record_filtered(arg)
+                alias = self._hybrid_alias(arg, hybrid_aliases, annotations)
+                conditions.append(arg._q(alias, negated=negated))
                 continue
-            if isinstance(arg, QQ):
-                qq_results.append(arg)
+            hybrid_lookups = _hybrid_lookups(arg) if isinstance(arg, models.Q) else None
+            if hybrid_lookups:
+                bindings = {}
+                negated = _negated_lookups(arg, negate)
+                for lookup in hybrid_lookups:
+                    result = lookup.orm_expression_result
+                    exists = self._to_many_exists(result)
+                    if exists is None and id(lookup) not in negated:
+                        exists = self._hybrid_condition(result, hybrid_aliases, annotations)
+                    if exists is None:
+                        _record_filtered(result)
+                        exists = self._hybrid_alias(result, hybrid_aliases, annotations)
+                    bindings[id(lookup)] = exists
+                qq_results.append(_bind_hybrid_lookups(arg, bindings))
                 continue
             if isinstance(arg, OrmExpression):
                 raise ValueError(f'{arg=} is not an OrmExpressionResult')
-            common_filter_args.append(arg)
+            common_args.append(arg)
 
-        self = super().filter(*common_filter_args, **kwargs)
+        if common_args or kwargs:
+            condition = models.Q(*common_args, **kwargs)
+            conditions.insert(0, ~condition if negate else condition)
+        if qq_results:
+            condition = models.Q(*qq_results)
+            conditions.append(~condition if negate else condition)
 
-        for qq_result in qq_results:
-            for orm_expression in qq_result.orm_expression_results:
-                self = self.annotate(**orm_expression._annotate())
-        self = self.filter(*qq_results)
+        queryset = super().alias(**annotations) if annotations else self
+        queryset = super(HybridQuerySet, queryset).filter(*conditions)
+        queryset._hybrid_aliases = hybrid_aliases
+        return queryset
 
-        for orm_expression_result in hybrid_expression_results:
-            self = orm_expression_result.apply(queryset=self)
 
-        return self
+    def _hybrid_condition(self, result: 'OrmExpressionResult', hybrid_aliases: Dict[Hashable, str], annotations: Dict[str, Any]) -> Optional[Any]:
+        """
+        The boolean hybrid's condition for WHERE, the hybrid is still
+        registered as an alias so values() can select it by name.
+        """
+        condition = result._condition()
+        if condition is not None:
+            self._hybrid_alias(result, hybrid_aliases, annotations)
+        return condition
 
+    def _to_many_exists(self, result: 'OrmExpressionResult') -> Optional[models.Exists]:
+        """
+        EXISTS() over the related rows matching the predicate when `through`
+        crosses a to-many relation, so parents aren't multiplied by a JOIN.
+        """
+        relation = _to_many_relation(self.model, result.expr_kwargs.get('through'))
+        if relation is None:
+            return None
+        correlation, related_model, back, inner_through = relation
+        expr_kwargs = _with_through(result.expr_kwargs, inner_through)
+        inner = dataclasses.replace(result, expr_kwargs=expr_kwargs, method='filter')
+        return models.Exists(HybridQuerySet(related_model).filter(inner, **{back: models.OuterRef(correlation)}))
 
-    def annotate(self, *args, **kwargs):
-        orm_expression_results: Dict[str, Any] = {}
-        common_annotate_args = []
-        for arg in args:
-            if isinstance(arg, OrmExpression):
-                annotate = arg.annotate()
-                orm_expression_results.update(annotate)
-                continue
-            if isinstance(arg, OrmExpressionResult):
-                raise ValueError(f'{arg=} is not an OrmExpression')
-            common_annotate_args.append(arg)
+    def _aggregate_annotation(self, aggregate: 'OrmAggregate') -> Any:
+        """
+        The aggregate as an annotation, over a to-many `through` it's a
+        correlated subquery aggregating each parent's related rows.
+        """
+        orm_expression = aggregate.orm_expression
+        relation = _to_many_relation(self.model, orm_expression.expr_kwargs.get('through'))
+        if relation is None:
+            return aggregate._build()
+        correlation, related_model, back, inner_through = relation
+        expression = _build_expression(orm_expression.expr, orm_expression.expr_args, _with_through(orm_expression.expr_kwargs, inner_through))
+        subquery = (
+            HybridQuerySet(related_model)
+            .filter(**{back: models.OuterRef(correlation)})
+            .order_by()
+            .values(back)
+            .annotate(value=_AGGREGATES[aggregate.function](expression, distinct=aggregate.distinct))
+            .values('value')
+        )
+        if aggregate.function == 'count':
+            return Coalesce(models.Subquery(subquery), 0)
+        return models.Subquery(subquery)
 
-        self = super().annotate(**orm_expression_results).annotate(*common_annotate_args, **kwargs)
-        return self
+
+_UNCACHED = object()
+
+
+def _with_through(expr_kwargs: Dict[str, Any], through: str) -> Dict[str, Any]:
+    expr_kwargs = {name: value for name, value in expr_kwargs.items() if name != 'through'}
+    if through:
+        expr_kwargs['through'] = through
+    return expr_kwargs
+
+
+@functools.lru_cache(maxsize=None)
+def _to_many_relation(model: type, through: Optional[str]) -> Optional[Tuple[str, type, str, str]]:
+    """
+    Split a `through` path at its first to-many relation, returning the outer
+    reference to correlate on, the related model, the lookup from it back to
+    the relation's owner and the rest of the path. None when single-valued.
+    """
+    if not through:
+        return None
+    names = through[:-len(LOOKUP_SEP)].split(LOOKUP_SEP)
+    opts = model._meta
+    for index, name in enumerate(names):
+        relation = opts.get_field(name)
+        if relation.one_to_many or relation.many_to_many:
+            if isinstance(relation, models.ForeignObjectRel):
+                back = relation.field.name
+            else:
+                back = relation.related_query_name()
+            outer = LOOKUP_SEP.join([*names[:index], 'pk'])
+            inner = ''.join(f'{rest}{LOOKUP_SEP}' for rest in names[index + 1:])
+            return outer, relation.related_model, back, inner
+        opts = relation.related_model._meta
+    return None
+
+
+def _build_aggregates(args: Tuple, kwargs: Dict[str, Any]) -> Tuple[Tuple, Dict[str, Any]]:
+    """Turn hybrid aggregates into Django's, positional ones get their default alias."""
+    aggregates = {}
+    for arg in args:
+        if isinstance(arg, OrmAggregate):
+            _check_default_alias(arg, aggregates)
+            aggregates[arg.default_alias] = arg._build()
+    args = tuple(arg for arg in args if not isinstance(arg, OrmAggregate))
+    kwargs = {name: value._build() if isinstance(value, OrmAggregate) else value for name, value in kwargs.items()}
+    return args, {**aggregates, **kwargs}
+
+
+def _check_default_alias(aggregate: 'OrmAggregate', aggregates: Dict[str, Any]) -> None:
+    if aggregate.default_alias in aggregates:
+        raise ValueError(f'{aggregate=} repeats the alias {aggregate.default_alias!r}, pass it as a keyword argument')
+
+
+def _hybrid_label(key: Hashable) -> str:
+    if key[0] == 'lower':
+        return f'LOWER({_hybrid_label(key[1])})'
+    expr, args, kwargs = key
+    arguments = [_frozen_repr(value) for value in args] + [f'{name}={_frozen_repr(value)}' for name, value in kwargs]
+    return f'{expr.__qualname__}({", ".join(arguments)})'
+
+
+def _hybrid_name(key: Hashable) -> str:
+    """The hybrid's label without its arguments, what instrumentation groups by."""
+    if key[0] == 'lower':
+        return f'LOWER({_hybrid_name(key[1])})'
+    return key[0].__qualname__
+
+
+def _frozen_repr(value: Hashable) -> str:
+    if isinstance(value, tuple) and len(value) == 2 and isinstance(value[0], type):
+        return repr(value[1])
+    if isinstance(value, tuple):
+        return f'[{", ".join(_frozen_repr(item) for item in value)}]'
+    return repr(value)
+
+
+def _hybrid_joins(query: models.sql.Query, alias: str) -> int:
+    """Tables other than the base one the hybrid's annotation reads."""
+    annotation = query.annotations.get(alias)
+    if annotation is None:
+        return 0
+    tables = {node.alias for node in annotation.flatten() if isinstance(node, Col)}
+    return len(tables - {query.base_table})
+
+
+def _ordering_names(query: models.sql.Query) -> Set[str]:
+    return {
+        item.lstrip('-') if isinstance(item, str) else item.expression.name
+        for item in query.order_by
+        if isinstance(item, str) or (isinstance(item, models.OrderBy) and isinstance(item.expression, models.F))
+    }
+
+
+def _ordering_terms(queryset: models.QuerySet) -> List[Tuple[str, bool]]:
+    """(name, descending) of the queryset's ordering, which must end up including the pk."""
+    query = queryset.query
+    ordering = query.order_by or (queryset.model._meta.ordering if query.default_ordering else ())
+    pk_name = queryset.model._meta.pk.name
+    terms = []
+    for item in ordering:
+        if isinstance(item, str):
+            name, descending = item.lstrip('-'), item.startswith('-')
+        elif isinstance(item, models.OrderBy) and isinstance(item.expression, models.F):
+            name, descending = item.expression.name, item.descending
+        else:
+            raise ValueError(f'Can\'t paginate by {item=}, order by fields or hybrids')
+        if name == '?':
+            raise ValueError('Can\'t paginate a random ordering')
+        name = pk_name if name == 'pk' else name
+        terms.append((name, descending != (not query.standard_ordering)))
+    if pk_name not in (name for name, _ in terms):
+        raise ValueError(f'The ordering must include the primary key to paginate, got {ordering}')
+    return terms
+
+
+class _Row(models.Func):
+    # (a, b, ...) row value
+    function = ''
+    output_field = models.Field()
+
+
+def _seek(terms: List[Tuple[str, bool]], values: List[Any]) -> models.Q:
+    """Predicate selecting the rows after `values` in the `terms` ordering."""
+    directions = {descending for _, descending in terms}
+    if len(directions) == 1:
+        lookup = models.lookups.LessThan if directions.pop() else models.lookups.GreaterThan
+        return models.Q(lookup(
+            _Row(*(models.F(name) for name, _ in terms)),
+            _Row(*(models.Value(value) for value in values)),
+        ))
+    # Mixed directions can't be compared as a row, expand it.
+    seek = models.Q()
+    for index, (name, descending) in enumerate(terms):
+        equal = {prev_name: value for (prev_name, _), value in zip(terms[:index], values)}
+        seek |= models.Q(**equal, **{f'{name}__{"lt" if descending else "gt"}': values[index]})
+    return seek
+
+
+class OrmManager(models.Manager.from_queryset(HybridQuerySet)):
+    # TODO: find the way to override the default manager or assign this manager as default
+    pass
+
+
+class HybridParameter(models.Expression):
+    """
+    Placeholder for an argument of a PreparedHybridQuery, compiled to a
+    query parameter that's bound to the argument on every call. Use it as a
+    scalar value, `n + 1`, `name.strip()` or `__in=ids` can't be rebound.
+    """
+    def __init__(self, index: int):
+        super().__init__()
+        self.index = index
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.index})'
+
+    def as_sql(self, compiler: Any, connection: Any) -> Tuple[str, List[Any]]:
+        return '%s', [self]
+
+
+def _adapt(connection: Any, value: Any) -> Any:
+    """Adapt a bound argument the way the field it's compared to would."""
+    ops = connection.ops
+    if isinstance(value, datetime.datetime):
+        return ops.adapt_datetimefield_value(value)
+    if isinstance(value, datetime.date):
+        return ops.adapt_datefield_value(value)
+    if isinstance(value, datetime.time):
+        return ops.adapt_timefield_value(value)
+    if isinstance(value, decimal.Decimal):
+        return ops.adapt_decimalfield_value(value)
+    return value
+
+
+class _PreparedQuery:
+    """Stand-in for a compiled Query that hands out a compiler with fixed SQL."""
+    def __init__(self, query: Any, compiler: Any):
+        self._query = query
+        self._compiler = compiler
+
+    def get_compiler(self, using: Optional[str] = None, connection: Any = None, elide_empty: bool = True) -> Any:
+        return self._compiler
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._query, name)
 
 
 @dataclass
+class _CompiledTemplate:
+    queryset: models.QuerySet
+    compiler: Any
+    sql: str
+    params: Tuple
+    # index of the call argument each parameter comes from, None for constants
+    slots: Tuple[Optional[int], ...]
+
+    def execute(self, values: Tuple) -> List[Any]:
+        connection = connections[self.compiler.using]
+        params = tuple(
+            param if slot is None else _adapt(connection, values[slot])
+            for param, slot in zip(self.params, self.slots)
+        )
+        compiler = copy.copy(self.compiler)
+        compiler.connection = connection
+        compiler.as_sql = lambda *args, **kwargs: (self.sql, params)
+
+        template = self.queryset
+        queryset = template.__class__(
+            model=template.model,
+            query=_PreparedQuery(template.query, compiler),
+            using=compiler.using,
+            hints=template._hints,
+        )
+        queryset._prefetch_related_lookups = template._prefetch_related_lookups
+        queryset._known_related_objects = template._known_related_objects
+        queryset._iterable_class = template._iterable_class
+        queryset._fields = template._fields
+        queryset._hybrid_aliases = template._hybrid_aliases
+        return list(queryset)
+
+
+class PreparedHybridQuery:
+    """
+    Query template built by HybridQuerySet.prepare(). The first call for a
+    database and a call shape (number of positional arguments and keyword
+    names) builds the query with HybridParameter placeholders and compiles
+    it, later calls only bind their arguments to the placeholders.
+    """
+    def __init__(self, queryset: models.QuerySet, build: Callable[..., models.QuerySet]):
+        self.queryset = queryset
+        self.build = build
+        self._templates: Dict[Hashable, Optional[_CompiledTemplate]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, *args: Any, **kwargs: Any) -> List[Any]:
+        using = self.queryset.db
+        names = tuple(sorted(kwargs))
+        key = (using, len(args), names)
+        try:
+            template = self._templates[key]
+        except KeyError:
+            with self._lock:
+                if key not in self._templates:
+                    self._templates[key] = self._compile(using, len(args), names)
+                template = self._templates[key]
+        if template is None:
+            # Empty whatever the arguments, e.g. filter(pk__in=[]).
+            return []
+        return template.execute((*args, *(kwargs[name] for name in names)))
+
+    async def acall(self, *args: Any, **kwargs: Any) -> List[Any]:
+        # Compiling needs the connection, so it can't run in the event loop.
+        return await sync_to_async(self)(*args, **kwargs)
+
+    def _compile(self, using: str, positional: int, names: Tuple[str, ...]) -> Optional[_CompiledTemplate]:
+        placeholders = [HybridParameter(index) for index in range(positional + len(names))]
+        queryset = self.build(self.queryset, *placeholders[:positional], **dict(zip(names, placeholders[positional:])))
+        compiler = queryset.query.get_compiler(using)
+        try:
+            sql, params = compiler.as_sql()
+        except EmptyResultSet:
+            return None
+        slots = tuple(param.index if isinstance(param, HybridParameter) else None for param in params)
+        return _CompiledTemplate(queryset, compiler, sql, tuple(params), slots)
+
+
+@dataclass(frozen=True, **_SLOTS)
 class OrmExpressionResult:
     expr: Callable
     lookup: Literal['exact'] = 'exact'
@@ -90,6 +1050,28 @@ class OrmExpressionResult:
     method: Literal['filter', 'exclude'] = 'filter'
     alias: Optional[str] = 'asdaslkdj'
     ignore_case: Optional[bool] = False
+
+    def __hash__(self):
+        return hash((self._key(), self.lookup, _freeze(self.value), self.method, self.alias, self.ignore_case))
+
+    def __invert__(self):
+        return dataclasses.replace(self, method='exclude' if self.method == 'filter' else 'filter')
+
+    def __and__(self, other):
+        return QQ(self) & other
+
+    def __or__(self, other):
+        return QQ(self) | other
+
+    def __xor__(self, other):
+        return QQ(self) ^ other
+
+    # Lets Q(...) & result combine, Q keeps the result as a child that
+    # _hybrid_q() turns into a lookup.
+    conditional = True
+
+    def copy(self) -> 'OrmExpressionResult':
+        return self
     
     @property
     def expression(self):
@@ -100,27 +1082,277 @@ class OrmExpressionResult:
         return getattr(queryset, self.method)(**self._filter_exclude())
 
     def _annotate(self) -> Dict[str, Any]:
-        return {self.alias: self.expr(self.expr, *self.expr_args, **self.expr_kwargs)}
+        return {self.alias: self._build()}
 
-    def _filter_exclude(self) -> Dict[str, Any]:
-        return {f'{self.alias}__{"i" if self.ignore_case else ""}{self.lookup}': self.value}
+    def _build(self) -> Any:
+        expression = _build_expression(self.expr, self.expr_args, self.expr_kwargs)
+        return Lower(expression) if self._case_folded() else expression
 
-class QQ(models.Q):
-    orm_expression_results: List[OrmExpressionResult] = []
+    def _key(self) -> Optional[Hashable]:
+        key = _expression_key(self.expr, self.expr_args, self.expr_kwargs)
+        return ('lower', key) if key is not None and self._case_folded() else key
 
-    def __init__(self, *args, _connector=None, _negated=False, **kwargs):
-        common_args = []
-        for arg in args:
-            if isinstance(arg, OrmExpressionResult):
-                self.orm_expression_results.append(arg)
-                kwargs.update(arg._filter_exclude())
+    def _condition(self) -> Optional[Any]:
+        """
+        The condition of a boolean hybrid, `CASE WHEN condition THEN True ELSE
+        False END`, compared to its THEN value, so it goes to WHERE as is.
+        None for anything else, comparing to the ELSE value keeps the CASE
+        since NOT(condition) drops the rows where it's NULL, so callers only
+        use it where the predicate isn't negated either.
+        """
+        if self.lookup != 'exact' or not isinstance(self.value, bool):
+            return None
+        expression = _build_expression(self.expr, self.expr_args, self.expr_kwargs)
+        if not isinstance(expression, models.Case) or len(expression.cases) != 1:
+            return None
+        (when,) = expression.cases
+        then, default = _boolean_value(when.result), _boolean_value(expression.default)
+        if then is None or default is None or then == default or then != self.value:
+            return None
+        return when.condition
+
+    def _case_folded(self) -> bool:
+        """
+        Case-insensitive equality is compared as LOWER(expression) = LOWER(value),
+        the shape of the index `db_index_ignore_case` creates.
+        """
+        return self.value is not None and (self.lookup == 'iexact' or self.ignore_case and self.lookup == 'exact')
+
+    def _filter_exclude(self, alias: Optional[str] = None) -> Dict[str, Any]:
+        if self._case_folded():
+            value = self.value if hasattr(self.value, 'resolve_expression') else models.Value(self.value)
+            return {f'{alias or self.alias}__exact': Lower(value)}
+        return {f'{alias or self.alias}__{"i" if self.ignore_case else ""}{self.lookup}': self.value}
+
+    def _q(self, alias: Optional[str] = None, negated: bool = False) -> models.Q:
+        q = models.Q(**self._filter_exclude(alias))
+        return ~q if negated else q
+
+    def matches(self, obj: models.Model) -> bool:
+        """Evaluate the predicate against an already fetched instance, without a query."""
+        return self._matches_lookup(obj) != (self.method == 'exclude')
+
+    def _matches_lookup(self, obj: models.Model) -> bool:
+        lookup = f'{"i" if self.ignore_case else ""}{self.lookup}'
+        return any(python_lookup(value, lookup, self.value) for value in self._python_values(obj))
+
+    def _python_values(self, obj: models.Model) -> List[Any]:
+        kwargs = dict(self.expr_kwargs)
+        through = kwargs.pop('through', None)
+        targets = resolve_path(obj, through[:-len(LOOKUP_SEP)].split(LOOKUP_SEP)) if through else [obj]
+        values = []
+        for target in targets:
+            if target is None:
                 continue
-            common_args.append(arg)
+            prop = _model_orm_properties(type(target)).get(self.expr)
+            if prop is None:
+                raise ValueError(f'{target=} has no {self.alias} hybrid')
+            values.append(prop._call(target, self.expr_args, kwargs))
+        return values
+
+def _boolean_value(expression: Any) -> Optional[bool]:
+    if isinstance(expression, models.Value) and isinstance(expression.value, bool):
+        return expression.value
+    return None
+
+
+class _HybridLookup(tuple):
+    """
+    A `(lookup, value)` child of a Q node that remembers the hybrid it was
+    built from. Q combination, copies and pickling move children around as
+    they are, so the hybrid travels with its lookup.
+    """
+    orm_expression_result: OrmExpressionResult
+
+    def __new__(cls, lookup: str, value: Any, orm_expression_result: OrmExpressionResult):
+        obj = super().__new__(cls, (lookup, value))
+        obj.orm_expression_result = orm_expression_result
+        return obj
+
+    @classmethod
+    def from_result(cls, orm_expression_result: OrmExpressionResult, alias: Optional[str] = None) -> '_HybridLookup':
+        ((lookup, value),) = orm_expression_result._filter_exclude(alias).items()
+        return cls(lookup, value, orm_expression_result)
+
+    def __getnewargs__(self):
+        return self[0], self[1], self.orm_expression_result
+
+
+def _hybrid_child(result: OrmExpressionResult) -> Any:
+    lookup = _HybridLookup.from_result(result)
+    return models.Q(lookup, _negated=True) if result.method == 'exclude' else lookup
+
+
+def _hybrid_q(q: models.Q) -> models.Q:
+    """Copy of the Q tree with the hybrid results plain Q kept as children turned into lookups."""
+    if not any(isinstance(child, (OrmExpressionResult, models.Q)) for child in q.children):
+        return q
+    children = [
+        _hybrid_child(child) if isinstance(child, OrmExpressionResult)
+        else _hybrid_q(child) if isinstance(child, models.Q)
+        else child
+        for child in q.children
+    ]
+    return q.create(children, connector=q.connector, negated=q.negated)
+
+
+def _hybrid_lookups(q: models.Q) -> List[_HybridLookup]:
+    lookups = []
+    for child in q.children:
+        if isinstance(child, _HybridLookup):
+            lookups.append(child)
+        elif isinstance(child, models.Q):
+            lookups.extend(_hybrid_lookups(child))
+    return lookups
+
+
+def _negated_lookups(q: models.Q, negated: bool = False) -> Set[int]:
+    """
+    id() of the hybrid lookups of the Q tree that end up under a NOT, XOR
+    counts as one since it's written with NOT on some backends.
+    """
+    negated = negated != q.negated or q.connector == models.Q.XOR
+    ids = set()
+    for child in q.children:
+        if isinstance(child, _HybridLookup):
+            if negated:
+                ids.add(id(child))
+        elif isinstance(child, models.Q):
+            ids |= _negated_lookups(child, negated)
+    return ids
+
+
+def _bind_hybrid_lookups(q: models.Q, aliases: Dict[int, Any]) -> models.Q:
+    """
+    Copy the Q tree pointing every hybrid lookup to the alias its expression
+    got in the query, `aliases` is keyed by the id() of the lookup. Lookups
+    bound to a condition instead of an alias are replaced by it.
+    """
+    children = []
+    for child in q.children:
+        if isinstance(child, _HybridLookup):
+            alias = aliases[id(child)]
+            child = _HybridLookup.from_result(child.orm_expression_result, alias) if isinstance(alias, str) else alias
+        elif isinstance(child, models.Q):
+            child = _bind_hybrid_lookups(child, aliases)
+        children.append(child)
+    return q.create(children, connector=q.connector, negated=q.negated)
+
+
+class QQ(models.Q):
+    """
+    Q accepting hybrid results, which also combine into one with `&`, `|`,
+    `^` and `~`: `(Person.total_notes() > 3) & ~Person.full_name().icontains('a')`.
+    """
+    def __init__(self, *args, _connector=None, _negated=False, **kwargs):
+        common_args = [_hybrid_child(arg) if isinstance(arg, OrmExpressionResult) else arg for arg in args]
         super().__init__(*common_args, _connector=_connector, _negated=_negated, **kwargs)
 
+    def _combine(self, other, conn):
+        if isinstance(other, OrmExpressionResult):
+            other = QQ(other)
+        return super()._combine(other, conn)
 
-@dataclass
+    @property
+    def orm_expression_results(self) -> List[OrmExpressionResult]:
+        return [lookup.orm_expression_result for lookup in _hybrid_lookups(_hybrid_q(self))]
+
+    def matches(self, obj: models.Model) -> bool:
+        return _matches_q(self, obj)
+
+
+def _matches_q(q: models.Q, obj: models.Model) -> bool:
+    results = (_matches_child(child, obj) for child in q.children)
+    if q.connector == models.Q.OR:
+        matched = any(results)
+    elif q.connector == models.Q.XOR:
+        matched = sum(results) % 2 == 1
+    else:
+        matched = all(results)
+    return matched != q.negated
+
+
+def _matches_child(child: Any, obj: models.Model) -> bool:
+    if isinstance(child, models.Q):
+        return _matches_q(child, obj)
+    if isinstance(child, _HybridLookup):
+        return child.orm_expression_result._matches_lookup(obj)
+    if isinstance(child, OrmExpressionResult):
+        return child.matches(obj)
+    if isinstance(child, tuple):
+        path, arg = child
+        attribute_path, lookup = split_lookup(path)
+        return any(
+            python_lookup(value() if isinstance(value, _BoundOrmProperty) else value, LOOKUP_SEP.join(lookup), arg)
+            for value in resolve_path(obj, attribute_path)
+        )
+    raise ValueError(f'{child=} can\'t be evaluated in memory')
+
+
+def filter_in_memory(objs: Iterable[models.Model], *args: Any, **kwargs: Any) -> List[models.Model]:
+    """
+    Apply filter() arguments (hybrid results, Q/QQ objects and lookups) to
+    already fetched instances, using the same lookup semantics as the
+    database.
+    """
+    predicates = [*args, models.Q(**kwargs)] if kwargs else args
+    for predicate in predicates:
+        if not isinstance(predicate, (OrmExpressionResult, models.Q)):
+            raise ValueError(f'{predicate=} can\'t be evaluated in memory')
+    return [
+        obj for obj in objs
+        if all(
+            predicate.matches(obj) if isinstance(predicate, OrmExpressionResult) else _matches_q(predicate, obj)
+            for predicate in predicates
+        )
+    ]
+
+
+class HybridPrefetch(models.Prefetch):
+    """
+    Prefetch annotating the related objects with `hybrids`, so calling them
+    on the prefetched instances returns the values the prefetch query
+    computed. Without `queryset` the related model is the one defining the
+    hybrids.
+    """
+    def __init__(
+        self,
+        lookup: str,
+        queryset: Optional[models.QuerySet] = None,
+        to_attr: Optional[str] = None,
+        hybrids: Iterable['OrmExpression'] = (),
+    ):
+        self.hybrids = list(hybrids)
+        for hybrid in self.hybrids:
+            if not isinstance(hybrid, OrmExpression):
+                raise ValueError(f'{hybrid=} is not an OrmExpression')
+            if 'through' in hybrid.expr_kwargs:
+                raise ValueError(f'{hybrid=} must be a hybrid of the prefetched model, without through')
+        if self.hybrids:
+            if queryset is None:
+                queryset = _hybrid_model(self.hybrids[0].expr)._default_manager.all()
+            if not isinstance(queryset, HybridQuerySet):
+                hybrid_queryset = HybridQuerySet(queryset.model, query=queryset.query.chain(), using=queryset._db)
+                hybrid_queryset._prefetch_related_lookups = queryset._prefetch_related_lookups
+                queryset = hybrid_queryset
+            queryset = queryset.annotate(*self.hybrids)
+        super().__init__(lookup, queryset=queryset, to_attr=to_attr)
+
+
+def _hybrid_model(expr: Callable) -> type:
+    """The model declaring the hybrid."""
+    for model in apps.get_models():
+        if any(isinstance(attr, orm_property) and attr.expr is expr for attr in vars(model).values()):
+            return model
+    raise ValueError(f'{expr.__qualname__} isn\'t declared on a model, pass a queryset')
+
+
+@dataclass(frozen=True, **_SLOTS)
 class OrmExpression:
+    """
+    Immutable, `~` and the lookup methods return new nodes, so instances can
+    be reused, shared between threads and hashed by value.
+    """
     expr: Callable
     expr_args: Tuple = field(default_factory=tuple)
     expr_kwargs: Dict = field(default_factory=dict)
@@ -129,19 +1361,37 @@ class OrmExpression:
     method: Literal['filter', 'exclude'] = 'filter'
 
     def __post_init__(self):
-        self.alias = self.expr_kwargs.pop('alias', self.expr.__name__)
-        self.ignore_case = self.expr_kwargs.pop('ignore_case', False)
-        if 'through' in self.expr_kwargs:
-            self._validate_through()
+        if not self.expr_kwargs:
+            object.__setattr__(self, 'alias', self.expr.__name__)
+            object.__setattr__(self, 'expr_kwargs', {})
+            return
+        expr_kwargs = dict(self.expr_kwargs)
+        object.__setattr__(self, 'alias', expr_kwargs.pop('alias', self.expr.__name__))
+        object.__setattr__(self, 'ignore_case', expr_kwargs.pop('ignore_case', self.ignore_case))
+        if 'through' in expr_kwargs:
+            expr_kwargs['through'] = _through_prefix(expr_kwargs['through'])
+        object.__setattr__(self, 'expr_kwargs', expr_kwargs)
 
-    def _validate_through(self) -> None:
-            through: str = self.expr_kwargs['through']
-            assert not through.endswith('__'), f'{through=} can\'t end with "__"'
-            assert not through.startswith('__'), f'{through=} can\'t start with "__"'
-            self.expr_kwargs['through'] = f'{through}__'
+    def __hash__(self):
+        key = self._key()
+        if key is None:
+            raise TypeError(f'unhashable arguments in {self!r}')
+        return hash((key, self.alias, self.ignore_case, self.method))
+
+    def _evolve(self, **changes: Any) -> 'OrmExpression':
+        # dataclasses.replace() would normalize the kwargs again
+        clone = copy.copy(self)
+        for name, value in changes.items():
+            object.__setattr__(clone, name, value)
+        return clone
 
     def __call__(self):
-        return self.expr(self.expr, *self.expr_args, **self.expr_kwargs)
+        return _build_expression(self.expr, self.expr_args, self.expr_kwargs)
+
+    _build = __call__
+
+    def _key(self) -> Optional[Hashable]:
+        return _expression_key(self.expr, self.expr_args, self.expr_kwargs)
 
     def annotate(self):
         return self._generate()._annotate()
@@ -164,8 +1414,7 @@ class OrmExpression:
         )
 
     def __invert__(self):
-        self.method = 'exclude' if self.method == 'filter' else 'filter'
-        return self
+        return self._evolve(method='exclude' if self.method == 'filter' else 'filter')
 
     __eq__ = __generate('exact')
     __contains__ = __generate('contains') # FIXME: not working
@@ -196,35 +1445,710 @@ class OrmExpression:
     day = __generate('day')
     search = __generate('search') # FIXME: check datbaase usage
 
+    def sum(self) -> 'OrmAggregate':
+        return OrmAggregate(self, 'sum')
+
+    def avg(self) -> 'OrmAggregate':
+        return OrmAggregate(self, 'avg')
+
+    def max(self) -> 'OrmAggregate':
+        return OrmAggregate(self, 'max')
+
+    def min(self) -> 'OrmAggregate':
+        return OrmAggregate(self, 'min')
+
+    def count(self, distinct: bool = False) -> 'OrmAggregate':
+        return OrmAggregate(self, 'count', distinct)
+
+    def count_distinct(self) -> 'OrmAggregate':
+        return self.count(distinct=True)
+
+    def set(self, value: Any) -> 'OrmAssignment':
+        return OrmAssignment(self, value)
+
+    def asc(self, nulls_first: Optional[bool] = None, nulls_last: Optional[bool] = None) -> 'OrmOrdering':
+        return OrmOrdering(self, False, nulls_first, nulls_last)
+
+    def desc(self, nulls_first: Optional[bool] = None, nulls_last: Optional[bool] = None) -> 'OrmOrdering':
+        return OrmOrdering(self, True, nulls_first, nulls_last)
+
+
+@dataclass(frozen=True, **_SLOTS)
+class OrmAssignment:
+    orm_expression: OrmExpression
+    value: Any
+
+    def _fields(self, model: type) -> Dict[str, Any]:
+        """Field values of `model` the hybrid's update_expression maps the value to."""
+        if 'through' in self.orm_expression.expr_kwargs:
+            raise ValueError('Hybrids can only be assigned on their own model, not through a relation')
+        prop = _model_orm_properties(model).get(self.orm_expression.expr)
+        if prop is None:
+            raise ValueError(f'{model.__name__} has no {self.orm_expression.alias} hybrid')
+        if prop.update_expr is None:
+            raise ValueError(f'Must define a @{prop.name}.update_expression to assign {prop.name}')
+        return prop.update_expr(prop.update_expr, self.value, *self.orm_expression.expr_args, **self.orm_expression.expr_kwargs)
+
+
+_AGGREGATES = {
+    'sum': models.Sum,
+    'avg': models.Avg,
+    'max': models.Max,
+    'min': models.Min,
+    'count': models.Count,
+}
+
+
+@dataclass(frozen=True, **_SLOTS)
+class OrmAggregate:
+    orm_expression: OrmExpression
+    function: Literal['sum', 'avg', 'max', 'min', 'count']
+    distinct: bool = False
+
+    @property
+    def default_alias(self) -> str:
+        # Same as Django's, e.g. Sum('total_notes') is total_notes__sum,
+        # distinct ones get their own so both fit in one query
+        return f'{self.orm_expression.alias}__{self.function}{"_distinct" if self.distinct else ""}'
+
+    def _build(self) -> models.Aggregate:
+        return _AGGREGATES[self.function](self.orm_expression._build(), distinct=self.distinct)
+
+
+@dataclass(frozen=True, **_SLOTS)
+class OrmOrdering:
+    orm_expression: OrmExpression
+    descending: bool = False
+    nulls_first: Optional[bool] = None
+    nulls_last: Optional[bool] = None
+
+    def _order_by(self, alias: str) -> models.OrderBy:
+        nulls = {}
+        if self.nulls_first is not None:
+            nulls['nulls_first'] = self.nulls_first
+        if self.nulls_last is not None:
+            nulls['nulls_last'] = self.nulls_last
+        expression = models.F(alias)
+        return expression.desc(**nulls) if self.descending else expression.asc(**nulls)
+
 
 @dataclass
 class orm_property:
-    func: Callable
+    """
+    Hybrid property, `stored=True` backs it with a `<name>_stored` column
+    (with `output_field` or the field the expression resolves to) that's
+    kept in sync on save, bulk_create, bulk_update and update, queries
+    read the column instead of computing the expression. A
+    save(update_fields=...) leaving the column out writes it with a second
+    UPDATE, wrap the save in transaction.atomic() if no reader may see the
+    column stale in between.
+
+    `db_index` and `db_index_ignore_case` add expression indexes on the
+    expression and on LOWER(expression) to the model's Meta.indexes, so
+    migrations follow the expression.
+
+    `depends_on` names the fields the instance side reads when the
+    expression doesn't show them, they're loaded in one query when
+    deferred and kept by only_for(), only() and defer().
+
+    Calls on an instance are memoized until its fields change, for hybrids
+    reading only fields of their own model and returning hashable values.
+    """
+    func: Optional[Callable] = None
     expr: Optional[Callable] = field(init=False, default=None)
+    update_expr: Optional[Callable] = field(init=False, default=None)
+    # Person.full_name, built once per expression
+    factory: Optional[Callable] = field(init=False, default=None, repr=False)
+    name: Optional[str] = field(init=False, default=None)
+    stored: bool = False
+    output_field: Optional[models.Field] = None
+    db_index: bool = False
+    db_index_ignore_case: bool = False
+    # fields the hybrid reads, found in the expression when not declared
+    depends_on: Optional[Iterable[str]] = None
+    sources: Set[str] = field(init=False, default_factory=set)
+
+    def __call__(self, func: Callable) -> 'orm_property':
+        # @orm_property(stored=True) form.
+        assert self.func is None, f'{self.func} is already decorated'
+        self.func = func
+        return self
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def contribute_to_class(self, cls, name):
+        self.name = name
+        setattr(cls, name, self)
+        if self.db_index or self.db_index_ignore_case:
+            self._add_indexes(cls)
+        if not self.stored:
+            return
+        assert self.expr is not None, f'Must define a @{self.func.__name__}.expression first'
+        self.sources = set(self.depends_on) if self.depends_on is not None else _expression_sources(self.expr(self.expr))
+        if any(LOOKUP_SEP in source for source in self.sources):
+            raise ValueError(f'Stored hybrid {name!r} can only read fields of its own model, got {self.sources=}')
+        if self.output_field is None:
+            # The expression can only be resolved once every field is there.
+            class_prepared.connect(self._add_stored_field, sender=cls, weak=False)
+        else:
+            self._add_stored_field(cls)
+
+    def _add_stored_field(self, sender, **kwargs):
+        stored_field = self.output_field
+        if stored_field is None:
+            resolved = self.expr(self.expr).resolve_expression(models.sql.Query(sender))
+            _, path, args, field_kwargs = resolved.output_field.deconstruct()
+            field_kwargs.update(null=True, blank=True, editable=False, db_index=True, unique=False, primary_key=False)
+            field_kwargs.pop('db_column', None)
+            stored_field = type(resolved.output_field)(*args, **field_kwargs)
+        sender.add_to_class(self.column, stored_field)
+        _STORED_COLUMNS[self.expr] = self.column
+
+    def _add_indexes(self, cls):
+        assert self.expr is not None, f'Must define a @{self.func.__name__}.expression first'
+        if self.stored:
+            expression = models.F(self.column)
+        else:
+            try:
+                expression = self.expr(self.expr)
+            except TypeError as e:
+                raise ValueError(f'Only hybrids without arguments can be indexed, {self.name!r} can\'t') from e
+        indexes = []
+        if self.db_index and not self.stored:
+            indexes.append(models.Index(expression, name=self._index_name(cls, 'idx')))
+        if self.db_index_ignore_case:
+            indexes.append(models.Index(Lower(expression), name=self._index_name(cls, 'lower')))
+        cls._meta.indexes = [*cls._meta.indexes, *indexes]
+
+    def _index_name(self, cls, suffix: str) -> str:
+        # Within the 30 characters Index.max_name_length allows.
+        table = cls._meta.db_table
+        return f'{table[:11]}_{self.name[:10]}_{names_digest(table, self.name, suffix, length=6)}'
+
+    @property
+    def column(self) -> str:
+        return f'{self.name}_stored'
+
+    def _store(self, instance: models.Model):
+        setattr(instance, self.column, self._call(instance, (), {}))
 
     def __get__(self, instance, owner) -> Union[Callable, OrmExpression]:
         if instance is None:
             assert self.expr is not None, f'Must define a @{self.func.__name__}.expression first'
-            return self._wrapper(self.expr)
-        return self.func.__get__(instance, owner)
-    
+            return self.factory
+        return _BoundOrmProperty(self, instance)
+
+    def __set__(self, instance, value):
+        # Django sets annotations as attributes. Park the value, only
+        # HybridModelIterable knows which hybrid (and args) built it.
+        instance.__dict__[self.name] = value
+
+    def _call(self, instance, args: Tuple, kwargs: Dict[str, Any]) -> Any:
+        # Memoized only while the instance's own fields stay the same, so
+        # only hybrids reading nothing else are.
+        key = _memo_key(self.name, args, kwargs)
+        if key is None or not self._sources(type(instance), args, kwargs)[1]:
+            self._load_sources(instance, args, kwargs)
+            return self.func(instance, *args, **kwargs)
+        cache = _hybrid_cache(instance)
+        state = _instance_state(instance)
+        if key in cache:
+            value, cached_state = cache[key]
+            if cached_state == state:
+                return value
+        if any(value is _DEFERRED for value in state):
+            self._load_sources(instance, args, kwargs)
+        value = self.func(instance, *args, **kwargs)
+        try:
+            hash(value)
+        except TypeError:
+            # Callers mustn't share a mutable result
+            return value
+        cache[key] = value, _instance_state(instance)
+        return value
+
+    def _load_sources(self, instance: models.Model, args: Tuple, kwargs: Dict[str, Any]) -> None:
+        # One query for the deferred fields the hybrid reads, rather than one per field.
+        sources = self._dependencies(type(instance), args, kwargs)
+        if not sources:
+            return
+        fields = _concrete_fields(type(instance))
+        deferred = [name for name in sources if fields[name].attname not in instance.__dict__]
+        if deferred:
+            instance.refresh_from_db(fields=deferred)
+
+    def _dependencies(self, model: type, args: Tuple = (), kwargs: Optional[Dict[str, Any]] = None) -> Optional[FrozenSet[str]]:
+        """
+        Names of the fields of `model` the hybrid reads, `depends_on` or the
+        ones its expression refers to. None when the expression can't be
+        built with these arguments.
+        """
+        return self._sources(model, args, kwargs)[0]
+
+    def _sources(self, model: type, args: Tuple = (), kwargs: Optional[Dict[str, Any]] = None) -> Tuple[Optional[FrozenSet[str]], bool]:
+        """The hybrid's dependencies and whether they're all plain fields of `model`."""
+        kwargs = kwargs or {}
+        # Declared dependencies don't vary with the arguments
+        key = model, self.expr if self.depends_on is not None else _expression_key(self.expr, args, kwargs)
+        with _DEPENDENCIES_LOCK:
+            if key in _DEPENDENCIES:
+                _DEPENDENCIES.move_to_end(key)
+                return _DEPENDENCIES[key]
+        if self.depends_on is not None:
+            paths = set(self.depends_on)
+        else:
+            try:
+                paths = _expression_sources(self.expr(self.expr, *args, **kwargs))
+            except TypeError:
+                paths = None
+        fields = _concrete_fields(model)
+        dependencies = None if paths is None else frozenset(
+            fields[name].name for name in (path.split(LOOKUP_SEP, 1)[0] for path in paths) if name in fields
+        )
+        local = paths is not None and all(path in fields and not fields[path].is_relation for path in paths)
+        if key[1] is not None:
+            with _DEPENDENCIES_LOCK:
+                _DEPENDENCIES[key] = dependencies, local
+                while len(_DEPENDENCIES) > _DEPENDENCIES_SIZE:
+                    _DEPENDENCIES.popitem(last=False)
+        return dependencies, local
+
+    def evaluate_many(self, objs: Iterable[Union[models.Model, Dict[str, Any]]], *args: Any, **kwargs: Any) -> List[Any]:
+        """
+        Evaluate the hybrid for every instance or values() row of `objs`.
+        Hybrids whose expression is +, - and * over numeric fields and
+        constants are computed column-wise with NumPy when it's installed,
+        anything else falls back to calling the instance side in a loop.
+        """
+        objs = list(objs)
+        if np is not None and objs:
+            expression = self.expr(self.expr, *args, **kwargs)
+            columns = _vectorizable_columns(expression)
+            if columns:
+                arrays = {}
+                for name in columns:
+                    if isinstance(objs[0], dict):
+                        array = np.array([row[name] for row in objs])
+                    else:
+                        array = np.array([getattr(obj, name) for obj in objs])
+                    # unsigned columns would wrap on subtraction
+                    if array.dtype.kind not in 'if':
+                        break
+                    arrays[name] = array
+                else:
+                    if not _may_overflow(expression, arrays):
+                        return _evaluate_columns(expression, arrays).tolist()
+
+        if isinstance(objs[0] if objs else None, dict):
+            return [self.func(SimpleNamespace(**row), *args, **kwargs) for row in objs]
+        return [self._call(obj, args, kwargs) for obj in objs]
+
     def _wrapper(self, expr):
         @functools.wraps(expr)
         def inner(*args, **kwargs):
             return OrmExpression(expr, expr_args=args, expr_kwargs=kwargs)
+        inner.evaluate_many = self.evaluate_many
         return inner
     
     def expression(self, expr):
-        if 'through' not in inspect.getfullargspec(expr).args:
-            warnings.warn(f'{expr} should have a "through" argument')
-        if expr.__doc__ is None:
-            expr.__doc__ = self.func.__doc__ if self.func.__doc__ else ''
-        expr.__doc__ += '''
+        # Signature and docs are worked out by hybrid_registry once the app is ready.
+        self.expr = expr
+        self.factory = self._wrapper(expr)
+        return self
+
+    def _document(self) -> None:
+        if getattr(self.expr, '_orm_hybrid_documented', False):
+            return
+        doc = self.expr.__doc__ or self.func.__doc__ or ''
+        self.expr.__doc__ = self.factory.__doc__ = doc + '''
 
         **kwargs:
             * alias (str): alias to be annotated.
             * through (str): through from where be accesss.
         '''
+        self.expr._orm_hybrid_documented = True
 
-        self.expr = expr
+    def update_expression(self, update_expr):
+        """
+        Map a new value of the hybrid to the fields that produce it, e.g.
+        `return {'second_note': value - F('first_note')}`, so
+        `update(Person.total_notes().set(10))` is a single UPDATE.
+        """
+        self.update_expr = update_expr
         return self
+
+
+_VECTORIZABLE_CONNECTORS = {
+    Combinable.ADD: operator.add,
+    Combinable.SUB: operator.sub,
+    Combinable.MUL: operator.mul,
+}
+
+
+def _vectorizable_columns(expression: Any) -> Optional[Set[str]]:
+    """
+    Return the fields an arithmetic expression reads, or None when it uses
+    anything that can't be evaluated column-wise with the same semantics.
+    """
+    if isinstance(expression, models.F):
+        return None if LOOKUP_SEP in expression.name else {expression.name}
+    if isinstance(expression, models.Value):
+        value = expression.value
+        return set() if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    if isinstance(expression, CombinedExpression) and expression.connector in _VECTORIZABLE_CONNECTORS:
+        lhs = _vectorizable_columns(expression.lhs)
+        rhs = _vectorizable_columns(expression.rhs)
+        return None if lhs is None or rhs is None else lhs | rhs
+    return None
+
+
+# Below int64's limit by enough to absorb float64 rounding.
+_INT64_BOUND = 2.0 ** 62
+
+
+def _may_overflow(expression: Any, arrays: Dict[str, Any]) -> bool:
+    """
+    Whether some step of the expression could leave int64 when evaluated
+    on integer columns, where NumPy wraps instead of growing like Python.
+    """
+    if not any(array.dtype.kind == 'i' for array in arrays.values()):
+        return False
+    floats = {name: array.astype(np.float64) for name, array in arrays.items()}
+    with np.errstate(over='ignore', invalid='ignore'):
+        _, peak = _float_peak(expression, floats)
+    return not peak < _INT64_BOUND
+
+
+def _float_peak(expression: Any, arrays: Dict[str, Any]) -> Tuple[Any, float]:
+    """Evaluate in float64, returning the values and the largest magnitude of any step."""
+    if isinstance(expression, models.F):
+        values = arrays[expression.name]
+        peak = 0.0
+    elif isinstance(expression, models.Value):
+        values = float(expression.value)
+        peak = 0.0
+    else:
+        lhs, lhs_peak = _float_peak(expression.lhs, arrays)
+        rhs, rhs_peak = _float_peak(expression.rhs, arrays)
+        values = _VECTORIZABLE_CONNECTORS[expression.connector](lhs, rhs)
+        peak = max(lhs_peak, rhs_peak)
+    return values, max(peak, float(np.max(np.abs(values))))
+
+
+def _evaluate_columns(expression: Any, arrays: Dict[str, Any]) -> Any:
+    if isinstance(expression, models.F):
+        return arrays[expression.name]
+    if isinstance(expression, models.Value):
+        return expression.value
+    return _VECTORIZABLE_CONNECTORS[expression.connector](
+        _evaluate_columns(expression.lhs, arrays),
+        _evaluate_columns(expression.rhs, arrays),
+    )
+
+
+def _expression_sources(expression: Any) -> Set[str]:
+    """Field paths an expression reads."""
+    if isinstance(expression, models.F):
+        return {expression.name}
+    sources = set()
+    if isinstance(expression, models.Q):
+        for child in expression.children:
+            if isinstance(child, tuple):
+                path, _ = split_lookup(child[0])
+                sources.add(LOOKUP_SEP.join(path))
+                sources |= _expression_sources(child[1])
+            else:
+                sources |= _expression_sources(child)
+    elif hasattr(expression, 'get_source_expressions'):
+        for source in expression.get_source_expressions():
+            sources |= _expression_sources(source)
+    return sources
+
+
+# expr -> column of stored hybrids
+_STORED_COLUMNS: Dict[Callable, str] = {}
+
+
+@functools.lru_cache(maxsize=None)
+def _stored_orm_properties(model: type) -> Tuple[orm_property, ...]:
+    return tuple(prop for prop in _model_orm_properties(model).values() if prop.stored)
+
+
+def _changed_stored_orm_properties(model: type, fields: Iterable[str]) -> List[orm_property]:
+    """Stored hybrids reading any of `fields` that aren't being written explicitly."""
+    fields = set(fields)
+    names = {
+        name
+        for f in model._meta.concrete_fields if f.name in fields or f.attname in fields
+        for name in (f.name, f.attname)
+    }
+    return [
+        prop for prop in _stored_orm_properties(model)
+        if prop.column not in fields and not prop.sources.isdisjoint(names)
+    ]
+
+
+# Lookups a plain index on the expression can serve.
+_INDEXABLE_LOOKUPS = {'exact', 'gt', 'gte', 'lt', 'lte', 'in', 'range', 'isnull', 'startswith'}
+# (expr, case folded) of every hybrid filtered on by this process
+_filtered_hybrids: Set[Tuple[Callable, bool]] = set()
+
+
+def _record_filtered(result: 'OrmExpressionResult') -> None:
+    if result._case_folded():
+        _filtered_hybrids.add((result.expr, True))
+    elif result.lookup in _INDEXABLE_LOOKUPS and not result.ignore_case:
+        _filtered_hybrids.add((result.expr, False))
+
+
+@checks.register(checks.Tags.models)
+def check_hybrid_indexes(app_configs=None, **kwargs) -> List[checks.CheckMessage]:
+    """
+    Warn about hybrids this process filtered on that no index covers. Only
+    filters already run are known, so `manage.py check` reports nothing,
+    run the check at the end of a test suite. Hybrids taking arguments
+    can't be indexed and are left out.
+    """
+    if app_configs is None:
+        model_list = apps.get_models()
+    else:
+        model_list = [model for app_config in app_configs for model in app_config.get_models()]
+    messages = []
+    for model in model_list:
+        for expr, prop in _model_orm_properties(model).items():
+            if _required_parameters(expr):
+                continue
+            if (expr, False) in _filtered_hybrids and not (prop.db_index or prop.stored):
+                messages.append(checks.Warning(
+                    f'{model.__name__}.{prop.name} is filtered on (by the queries this process ran) but has no index.',
+                    hint='Add db_index=True to the orm_property.',
+                    obj=model,
+                    id='django_orm_hybrid.W001',
+                ))
+            if (expr, True) in _filtered_hybrids and not prop.db_index_ignore_case:
+                messages.append(checks.Warning(
+                    f'{model.__name__}.{prop.name} is filtered on ignoring case (by the queries this process ran) but has no LOWER() index.',
+                    hint='Add db_index_ignore_case=True to the orm_property.',
+                    obj=model,
+                    id='django_orm_hybrid.W002',
+                ))
+    return messages
+
+
+@receiver(class_prepared)
+def _connect_model_receivers(sender, **kwargs):
+    # Per model rather than for every save, looked up without the caches
+    # so historical migration models aren't kept alive by them. Those have
+    # no OrmManager, only models that do invalidate the result cache on delete.
+    if any(isinstance(attr, orm_property) and attr.stored for klass in sender.__mro__ for attr in vars(klass).values()):
+        pre_save.connect(_update_stored_orm_properties, sender=sender)
+        post_save.connect(_save_stored_orm_properties, sender=sender)
+    if any(isinstance(manager, OrmManager) for manager in sender._meta.managers):
+        watch_deletes(sender)
+
+
+def _update_stored_orm_properties(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is None:
+        props = _stored_orm_properties(sender)
+    else:
+        props = _changed_stored_orm_properties(sender, update_fields)
+    for prop in props:
+        prop._store(instance)
+
+
+def _save_stored_orm_properties(sender, instance, raw=False, update_fields=None, **kwargs):
+    # save(update_fields=...) leaves out the stored columns of the hybrids
+    # pre_save recomputed, write them with a second UPDATE. Signals can't
+    # make both atomic, the caller's transaction.atomic() does.
+    if raw or update_fields is None:
+        return
+    columns = {
+        prop.column: getattr(instance, prop.column)
+        for prop in _changed_stored_orm_properties(sender, update_fields)
+    }
+    if columns:
+        models.QuerySet(sender).filter(pk=instance.pk).update(**columns)
+
+
+class _BoundOrmProperty:
+    __slots__ = ('orm_property', 'instance')
+
+    def __init__(self, orm_property: orm_property, instance: models.Model):
+        self.orm_property = orm_property
+        self.instance = instance
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.orm_property._call(self.instance, args, kwargs)
+
+    def __repr__(self) -> str:
+        return f'<bound orm_property {self.orm_property.name} of {self.instance!r}>'
+
+
+_DEFERRED = object()
+
+
+@functools.lru_cache(maxsize=None)
+def _concrete_attnames(model: type) -> Tuple[str, ...]:
+    return tuple(f.attname for f in model._meta.concrete_fields)
+
+
+@functools.lru_cache(maxsize=None)
+def _concrete_fields(model: type) -> Dict[str, models.Field]:
+    """Concrete fields by name and attname."""
+    fields = {}
+    for f in model._meta.concrete_fields:
+        fields[f.name] = fields[f.attname] = f
+    return fields
+
+
+# (model, expression key) -> fields the hybrid reads and whether they're all
+# local, the least recently used go first since the keys hold argument values
+_DEPENDENCIES: 'OrderedDict[Tuple[type, Hashable], Tuple[Optional[FrozenSet[str]], bool]]' = OrderedDict()
+_DEPENDENCIES_SIZE = 1024
+_DEPENDENCIES_LOCK = threading.Lock()
+
+
+def _instance_state(instance: models.Model) -> Tuple:
+    """Values of the instance's own fields, a memoized hybrid is stale once they change."""
+    values = instance.__dict__
+    return tuple(values.get(attname, _DEFERRED) for attname in _concrete_attnames(type(instance)))
+
+
+def _memo_key(name: str, args: Tuple, kwargs: Dict[str, Any]) -> Optional[Hashable]:
+    """Key of a hybrid call in the instance memo, by name so instances still pickle."""
+    try:
+        return name, _freeze(args), _freeze(kwargs)
+    except TypeError:
+        return None
+
+
+def _hybrid_cache(instance: models.Model) -> Dict[Hashable, Tuple[Any, Tuple]]:
+    try:
+        return instance.__dict__['_hybrid_cache']
+    except KeyError:
+        cache = instance.__dict__['_hybrid_cache'] = {}
+        return cache
+
+
+@functools.lru_cache(maxsize=None)
+def _model_orm_properties(model: type) -> Dict[Callable, orm_property]:
+    return {
+        attr.expr: attr
+        for klass in reversed(model.__mro__)
+        for attr in vars(klass).values()
+        if isinstance(attr, orm_property) and attr.expr is not None
+    }
+
+
+@dataclass(frozen=True)
+class HybridInfo:
+    """A hybrid of a model as seen by tools, without building it."""
+    model: type
+    name: str
+    orm_property: orm_property = field(repr=False)
+    # of the expression, without its leading cls
+    signature: inspect.Signature
+    through: bool
+
+    @property
+    def parameters(self) -> Tuple[str, ...]:
+        """The hybrid's own arguments, `through` aside."""
+        return tuple(name for name in self.signature.parameters if name != 'through')
+
+    @property
+    def sources(self) -> Optional[FrozenSet[str]]:
+        """Fields the hybrid reads called without arguments, None if it needs some."""
+        return self.orm_property._dependencies(self.model)
+
+    def bind(self, *args: Any, **kwargs: Any) -> inspect.BoundArguments:
+        """Validate a call against the expression, raising TypeError like calling it would."""
+        return self.signature.bind(*args, **kwargs)
+
+
+def _required_parameters(expr: Callable) -> List[str]:
+    """Arguments a hybrid can't be built without."""
+    return [
+        parameter.name for parameter in _expression_signature(expr).parameters.values()
+        if parameter.default is parameter.empty and parameter.kind not in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD)
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def _expression_signature(expr: Callable) -> inspect.Signature:
+    signature = inspect.signature(expr)
+    return signature.replace(parameters=list(signature.parameters.values())[1:])
+
+
+class HybridRegistry:
+    """
+    Every model's hybrids by name. Filled once when the app is ready rather
+    than at class definition, models loaded later are added on first use.
+    """
+    def __init__(self):
+        self.ready = False
+        self._models: Dict[type, Dict[str, HybridInfo]] = {}
+        self._lock = threading.Lock()
+
+    def populate(self, model_list: Optional[Iterable[type]] = None) -> None:
+        for model in apps.get_models() if model_list is None else model_list:
+            self.for_model(model)
+        self.ready = True
+
+    def for_model(self, model: type) -> Dict[str, HybridInfo]:
+        hybrids = self._models.get(model)
+        if hybrids is not None:
+            return hybrids
+        with self._lock:
+            hybrids = self._models.get(model)
+            if hybrids is None:
+                hybrids = self._models[model] = {
+                    prop.name: _hybrid_info(model, prop) for prop in _model_orm_properties(model).values()
+                }
+        return hybrids
+
+    def get(self, model: type, name: str) -> HybridInfo:
+        try:
+            return self.for_model(model)[name]
+        except KeyError:
+            raise LookupError(f'{model.__name__} has no hybrid {name!r}') from None
+
+    def __iter__(self) -> Iterator[HybridInfo]:
+        for hybrids in list(self._models.values()):
+            yield from hybrids.values()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self.ready = False
+
+
+def _hybrid_info(model: type, prop: orm_property) -> HybridInfo:
+    prop._document()
+    signature = _expression_signature(prop.expr)
+    return HybridInfo(model, prop.name, prop, signature, 'through' in signature.parameters)
+
+
+hybrid_registry = HybridRegistry()
+
+
+@checks.register(checks.Tags.models)
+def check_hybrid_signatures(app_configs=None, **kwargs) -> List[checks.CheckMessage]:
+    """Warn about hybrid expressions that can't be used through a relation."""
+    if app_configs is None:
+        model_list = apps.get_models()
+    else:
+        model_list = [model for app_config in app_configs for model in app_config.get_models()]
+    return [
+        checks.Warning(
+            f'{model.__name__}.{info.name} expression has no "through" argument.',
+            hint='Accept through=\'\' and prefix the fields with it, so the hybrid works across relations.',
+            obj=model,
+            id='django_orm_hybrid.W003',
+        )
+        for model in model_list
+        for info in hybrid_registry.for_model(model).values()
+        if not info.through
+    ]
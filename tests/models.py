@@ -2,6 +2,7 @@ from django.core.validators import MaxValueValidator
 from django.db import models
 from django.db.models.expressions import F, Case, Value, When
 from django.db.models.functions import Concat
+from django.db.models.lookups import GreaterThan
 
 from django_orm_hybrid.models import OrmManager, orm_property, OrmExpression, OrmExpressionResult
 
@@ -22,11 +23,11 @@ class Person(models.Model):
     @approved.expression
     def approved(self, n, through=''):
         return Case(
-            When(F(f'{through}first_note') + F(f'{through}second_note') > n, then=Value(True)),
+            When(GreaterThan(F(f'{through}first_note') + F(f'{through}second_note'), n), then=Value(True)),
             default=Value(False),
         )
 
-    @orm_property
+    @orm_property(db_index=True)
     def total_notes(self):
         return self.first_note + self.second_note
     
@@ -34,6 +35,10 @@ class Person(models.Model):
     def total_notes(cls, through=''):
         return models.F(f'{through}first_note') + models.F(f'{through}second_note')
 
+    @total_notes.update_expression
+    def total_notes(cls, value):
+        return {'second_note': value - models.F('first_note')}
+
     @orm_property
     def notes_concat(self):
         return f'{self.first_note} - {self.second_note}'
@@ -55,7 +60,7 @@ class Person(models.Model):
     def notes_multiplication(cls, n, through=''):
         return models.F(f'{through}first_note') * models.F(f'{through}second_note') * n
 
-    @orm_property
+    @orm_property(db_index_ignore_case=True)
     def full_name(self):
         return self.first_name + ' ' + self.last_name
 
@@ -75,9 +80,65 @@ class Person(models.Model):
     def birth_datetime(cls, through=''):
         return models.F(f'{through}datetime')
 
+    @orm_property(stored=True, output_field=models.CharField(max_length=127, null=True, db_index=True, editable=False))
+    def display_name(self):
+        return self.last_name + ', ' + self.first_name
+
+    @display_name.expression
+    def display_name(cls, through=''):
+        return Concat(
+            f'{through}last_name',
+            Value(', '),
+            f'{through}first_name',
+        )
+
+    @orm_property(stored=True)
+    def notes_difference(self):
+        return self.second_note - self.first_note
+
+    @notes_difference.expression
+    def notes_difference(cls, through=''):
+        return models.F(f'{through}second_note') - models.F(f'{through}first_note')
+
 
 class Profile(models.Model):
     person = models.OneToOneField(Person, on_delete=models.CASCADE, related_name='profile')
     age = models.IntegerField(validators=[MaxValueValidator(100)])
 
     objects = OrmManager()
+
+    @orm_property
+    def person_first_name(self):
+        return self.person.first_name
+
+    @person_first_name.expression
+    def person_first_name(cls, through=''):
+        return F(f'{through}person__first_name')
+
+
+class Exam(models.Model):
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='exams')
+    score = models.IntegerField()
+    bonus = models.IntegerField(default=0)
+
+    objects = OrmManager()
+
+    @orm_property
+    def final_score(self):
+        return self.score + self.bonus
+
+    @final_score.expression
+    def final_score(cls, through=''):
+        return models.F(f'{through}score') + models.F(f'{through}bonus')
+
+
+
+# Plain managers, rows only reached by the cascade from Person
+class Certificate(models.Model):
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='certificates')
+    title = models.CharField(max_length=63)
+
+
+class CertificateSignature(models.Model):
+    certificate = models.ForeignKey(Certificate, on_delete=models.CASCADE, related_name='signatures')
+    signer = models.CharField(max_length=63)
@@ -1,15 +1,30 @@
+import copy, dataclasses, io, json, pickle, sys
+from collections import OrderedDict
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.db import connection
 from django.db.models.expressions import Case, Value, When
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db.models.functions import Lower
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
-from unittest import skip
+from unittest import skip, skipIf
 from django.db import models
 from django.utils.timezone import now, timedelta
 
-from django_orm_hybrid.models import QQ, OrmManager, orm_property, OrmExpression, OrmExpressionResult
+from django_orm_hybrid.export import write_csv, write_ndjson
+from django_orm_hybrid.instrumentation import recorder
+from django_orm_hybrid.models import QQ, HybridPrefetch, HybridQuerySet, check_hybrid_indexes, check_hybrid_signatures, hybrid_registry, HybridRegistry, expression_cache, filter_in_memory, OrmManager, orm_property, OrmExpression, OrmExpressionResult
 
-from .models import Person, Profile
+from .models import Certificate, CertificateSignature, Exam, Person, Profile
 
 
-class HighLevelTestCase(TestCase):
+class HybridTestCase(TestCase):
+    """Two people with their profiles, the fixture most cases share."""
     def setUp(self):
         super().setUp()
         self.person1: Person = Person.objects.create(first_note=1, second_note=2, first_name='Lautaro', last_name='Redbear', datetime=now())
@@ -17,6 +32,8 @@ class HighLevelTestCase(TestCase):
         self.person2: Person = Person.objects.create(first_note=3, second_note=4, first_name='Gabriel', last_name='Smith', datetime=now() + timedelta(days=5))
         Profile.objects.create(person=self.person2, age=30)
 
+
+class HighLevelTestCase(HybridTestCase):
     def test_instance_orm_property(self):
         self.assertEqual(self.person1.full_name(), 'Lautaro Redbear')
         self.assertEqual(self.person2.full_name(), 'Gabriel Smith')
@@ -556,4 +573,1242 @@ class HighLevelTestCase(TestCase):
         #         default=Value(False),
         #     ),
         # ).filter(case_when=True)
-        # self.assertEqual(list(queryset), [self.person1])
\ No newline at end of file
+        # self.assertEqual(list(queryset), [self.person1])
+
+class HybridQuerySetTestCase(HybridTestCase):
+    def test_manager_returns_hybrid_queryset(self):
+        self.assertIsInstance(Person.objects.all(), HybridQuerySet)
+        self.assertIs(HybridQuerySet.as_manager()._queryset_class, HybridQuerySet)
+        self.assertIsInstance(Person.objects.filter(first_name='Lautaro'), HybridQuerySet)
+
+    def test_chained_filter(self):
+        queryset = Person.objects.all().filter(Person.total_notes() > 3).values_list('total_notes', flat=True)
+        self.assertEqual(list(queryset), [7])
+        queryset = Person.objects.filter(first_name='Gabriel').filter(Person.full_name().icontains('smith')).values_list('full_name', flat=True)
+        self.assertEqual(list(queryset), ['Gabriel Smith'])
+        queryset = Person.objects.filter(Person.total_notes() > 0).exclude(Person.full_name() == 'Gabriel Smith').values_list('full_name', flat=True)
+        self.assertEqual(list(queryset), ['Lautaro Redbear'])
+        queryset = Person.objects.order_by('pk').annotate(Person.notes_concat()).values_list('notes_concat', flat=True)
+        self.assertEqual(list(queryset), ['1 - 2', '3 - 4'])
+
+    def test_several_hybrids_in_one_call(self):
+        queryset = Person.objects.filter(
+            Person.total_notes() > 1,
+            Person.full_name().startswith('Gab'),
+            QQ(Person.notes_concat() == '3 - 4'),
+            first_note=3,
+        ).values_list('full_name', flat=True)
+        self.assertEqual(list(queryset), ['Gabriel Smith'])
+        queryset = Person.objects.exclude(Person.total_notes() > 3, Person.full_name().startswith('Gab')).values_list('full_name', flat=True)
+        self.assertEqual(list(queryset), ['Lautaro Redbear'])
+
+    def test_inverted_expression(self):
+        queryset = Person.objects.filter(~Person.total_notes() > 3).values_list('total_notes', flat=True)
+        self.assertEqual(list(queryset), [3])
+        queryset = Person.objects.exclude(~Person.total_notes() > 3).values_list('total_notes', flat=True)
+        self.assertEqual(list(queryset), [7])
+
+    def test_filter_only_hybrid_is_not_selected(self):
+        queryset = Person.objects.filter(Person.total_notes() > 3, QQ(Person.full_name() == 'Gabriel Smith'))
+        self.assertEqual(list(queryset.query.annotation_select), [])
+        self.assertEqual(list(queryset), [self.person2])
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(queryset.all().count(), 1)
+        self.assertTrue(context.captured_queries[0]['sql'].startswith('SELECT COUNT(*)'))
+        self.assertNotIn('SELECT COUNT(*) FROM (SELECT', context.captured_queries[0]['sql'])
+
+    def test_filter_only_hybrid_is_promoted_on_demand(self):
+        queryset = Person.objects.filter(Person.total_notes() > 3)
+        self.assertEqual(list(queryset.values('total_notes')), [{'total_notes': 7}])
+        self.assertEqual(list(queryset.annotate(Person.total_notes()).values_list('total_notes', flat=True)), [7])
+        queryset = Person.objects.annotate(Person.total_notes()).filter(Person.total_notes() > 3)
+        self.assertEqual(list(queryset.query.annotation_select), ['total_notes'])
+
+    def test_repeated_hybrid_is_built_once(self):
+        queryset = Person.objects.filter(Person.full_name().startswith('Lau')).filter(
+            QQ(Person.full_name() == 'Lautaro Redbear'),
+        ).annotate(Person.full_name())
+        self.assertIn('full_name', queryset.query.annotations)
+        self.assertNotIn('full_name_2', queryset.query.annotations)
+        self.assertEqual(list(queryset.values_list('full_name', flat=True)), ['Lautaro Redbear'])
+
+    def test_colliding_hybrids_get_unique_aliases(self):
+        queryset = Person.objects.annotate(
+            Person.notes_multiplication(10),
+            Person.notes_multiplication(20),
+        ).values_list('notes_multiplication', 'notes_multiplication_2')
+        self.assertEqual(list(queryset), [(20, 40), (120, 240)])
+        queryset = Person.objects.filter(Person.notes_multiplication(10) == 20).filter(
+            Person.notes_multiplication(20) == 40,
+        ).annotate(Person.notes_multiplication(10)).values_list('notes_multiplication', flat=True)
+        self.assertEqual(list(queryset), [20])
+
+    def test_qq_tracks_its_own_expressions(self):
+        QQ(Person.notes_concat() == '1 - 2')
+        qq = QQ(Person.full_name() == 'Lautaro Redbear')
+        self.assertEqual([result.alias for result in qq.orm_expression_results], ['full_name'])
+        queryset = Person.objects.filter(qq)
+        self.assertEqual(list(queryset.query.annotations), ['full_name'])
+
+    def test_qq_expressions_survive_combination_and_copies(self):
+        qq = ~(QQ(Person.full_name() == 'Gabriel Smith') | QQ(Person.total_notes() > 5)) & QQ(Person.notes_concat() == '1 - 2')
+        self.assertEqual([result.alias for result in qq.orm_expression_results], ['full_name', 'total_notes', 'notes_concat'])
+        for q in (qq, copy.copy(qq), copy.deepcopy(qq)):
+            self.assertEqual(list(Person.objects.filter(q)), [self.person1])
+        queryset = Person.objects.filter(models.Q(first_name='Gabriel') | QQ(Person.total_notes() < 5)).order_by('pk')
+        self.assertEqual(list(queryset), [self.person1, self.person2])
+
+    def test_explicit_alias_of_repeated_hybrid(self):
+        queryset = Person.objects.annotate(Person.total_notes()).annotate(Person.total_notes(alias='t2')).order_by('pk')
+        self.assertEqual(list(queryset.values_list('total_notes', 't2')), [(3, 3), (7, 7)])
+        queryset = Person.objects.filter(Person.total_notes() > 3).values_list(Person.total_notes(alias='notes'), flat=True)
+        self.assertEqual(list(queryset), [7])
+
+    def test_annotate_takes_name_from_filter_alias(self):
+        queryset = Person.objects.filter(Person.notes_multiplication(10) > 0).annotate(Person.notes_multiplication(20)).order_by('pk')
+        self.assertEqual(list(queryset.values_list('notes_multiplication', flat=True)), [40, 240])
+        self.assertEqual([person.notes_multiplication(20) for person in queryset], [40, 240])
+        queryset = Person.objects.filter(Person.notes_multiplication(10) > 20).values_list(Person.notes_multiplication(1), flat=True)
+        self.assertEqual(list(queryset), [12])
+        with self.assertRaises(ValueError):
+            Person.objects.order_by(Person.notes_multiplication(10)).annotate(Person.notes_multiplication(20))
+
+    def test_qq_with_colliding_alias(self):
+        queryset = Person.objects.annotate(Person.notes_multiplication(10)).filter(
+            QQ(Person.notes_multiplication(20) == 240),
+        ).values_list('notes_multiplication', flat=True)
+        self.assertEqual(list(queryset), [120])
+
+
+class ExpressionCacheTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        expression_cache.clear()
+        Person.objects.create(first_note=1, second_note=2, first_name='Lautaro', last_name='Redbear', datetime=now())
+
+    def test_disabled_by_default(self):
+        Person.full_name()()
+        Person.full_name()()
+        self.assertEqual(expression_cache.info(), (0, 0, 0, 0))
+
+    @override_settings(ORM_HYBRID_EXPRESSION_CACHE_SIZE=2)
+    def test_hits_misses_and_copies(self):
+        first = Person.full_name()()
+        second = Person.full_name()()
+        self.assertIsNot(first, second)
+        self.assertEqual(first, second)
+        Person.full_name(through='person')()
+        self.assertEqual(expression_cache.info(), (1, 2, 2, 2))
+        queryset = Person.objects.filter(Person.full_name() == 'Lautaro Redbear').values_list('full_name', flat=True)
+        self.assertEqual(list(queryset), ['Lautaro Redbear'])
+        self.assertEqual(expression_cache.info().hits, 2)
+
+    @override_settings(ORM_HYBRID_EXPRESSION_CACHE_SIZE=2)
+    def test_eviction(self):
+        for n in (10, 20, 30):
+            Person.notes_multiplication(n)()
+        Person.notes_multiplication(10)()
+        self.assertEqual(expression_cache.info(), (0, 4, 2, 2))
+        Person.notes_multiplication(30)()
+        self.assertEqual(expression_cache.info().hits, 1)
+        expression_cache.resize(1)
+        self.assertEqual(expression_cache.info().currsize, 1)
+
+
+class PreparedHybridQueryTestCase(HybridTestCase):
+    def setUp(self):
+        super().setUp()
+        self.builds = 0
+
+    def counting(self, build):
+        def inner(queryset, *args, **kwargs):
+            self.builds += 1
+            return build(queryset, *args, **kwargs)
+        return inner
+
+    def test_rebinds_parameters(self):
+        prepared = Person.objects.prepare(self.counting(lambda qs, n: qs.filter(Person.total_notes() > n).order_by('pk')))
+        self.assertEqual(prepared(3), [self.person2])
+        self.assertEqual(prepared(0), [self.person1, self.person2])
+        self.assertEqual(prepared(n=10), [])
+        self.assertEqual(prepared(n=2), [self.person1, self.person2])
+        # one build per call shape
+        self.assertEqual(self.builds, 2)
+
+    def test_rebinds_values(self):
+        prepared = Person.objects.prepare(self.counting(
+            lambda qs, name, n: qs.filter(Person.full_name() == name, first_note__gte=n).values_list('full_name', flat=True),
+        ))
+        self.assertEqual(prepared('Lautaro Redbear', 0), ['Lautaro Redbear'])
+        self.assertEqual(prepared('Gabriel Smith', 0), ['Gabriel Smith'])
+        self.assertEqual(prepared('Gabriel Smith', 5), [])
+        self.assertEqual(self.builds, 1)
+
+    def test_rebinds_lookup_and_hybrid_arguments(self):
+        prepared = Person.objects.prepare(self.counting(lambda qs, name: qs.filter(Person.full_name().icontains(name))))
+        self.assertEqual(prepared('redbear'), [self.person1])
+        self.assertEqual(prepared('smith'), [self.person2])
+        prepared_iexact = Person.objects.prepare(lambda qs, name: qs.filter(Person.full_name().iexact(name)))
+        self.assertEqual(prepared_iexact('GABRIEL SMITH'), [self.person2])
+        prepared_args = Person.objects.prepare(lambda qs, n: qs.filter(Person.notes_multiplication(n) > 20))
+        self.assertEqual(prepared_args(1), [])
+        self.assertEqual(prepared_args(10), [self.person2])
+        prepared_dates = Person.objects.prepare(lambda qs, since: qs.filter(datetime__gt=since))
+        self.assertEqual(prepared_dates(now() + timedelta(days=1)), [self.person2])
+        self.assertEqual(self.builds, 1)
+
+    def test_arguments_are_placeholders(self):
+        prepared = Person.objects.prepare(lambda qs, name: qs.filter(Person.full_name() == name.strip()))
+        with self.assertRaises(AttributeError):
+            prepared(' Gabriel Smith ')
+
+    def test_orders_by_hybrid(self):
+        prepared = Person.objects.prepare(lambda qs, n: qs.filter(Person.total_notes() > n).order_by(Person.total_notes().desc(), 'pk'))
+        self.assertEqual(prepared(0), [self.person2, self.person1])
+        prepared_page = Person.objects.prepare(lambda qs, n: qs.filter(Person.total_notes() > n).order_by(Person.total_notes().desc(), 'pk').paginate_after(None, 1))
+        self.assertEqual(prepared_page(0), [self.person2])
+
+    def test_empty_result(self):
+        prepared = Person.objects.prepare(lambda qs, n: qs.filter(Person.total_notes() > n, pk__in=[]))
+        self.assertEqual(prepared(0), [])
+
+
+class InstanceOrmPropertyTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.person: Person = Person.objects.create(first_note=1, second_note=2, first_name='Lautaro', last_name='Redbear', datetime=now())
+        self.calls = []
+
+    def count_calls(self, name):
+        prop = Person.__dict__[name]
+        func = prop.func
+        def inner(instance, *args, **kwargs):
+            self.calls.append(name)
+            return func(instance, *args, **kwargs)
+        prop.func = inner
+        self.addCleanup(setattr, prop, 'func', func)
+
+    def test_annotated_value_is_reused(self):
+        self.count_calls('full_name')
+        person = Person.objects.annotate(Person.full_name()).get()
+        self.assertEqual(person.full_name(), 'Lautaro Redbear')
+        person = Person.objects.filter(Person.full_name() == 'Lautaro Redbear').annotate(Person.full_name()).get()
+        self.assertEqual(person.full_name(), 'Lautaro Redbear')
+        self.assertEqual(self.calls, [])
+
+    def test_annotated_value_matches_args(self):
+        self.count_calls('notes_multiplication')
+        person = Person.objects.annotate(Person.notes_multiplication(10), Person.notes_multiplication(20)).get()
+        self.assertEqual(person.notes_multiplication(10), 20)
+        self.assertEqual(person.notes_multiplication(20), 40)
+        self.assertEqual(self.calls, [])
+        self.assertEqual(person.notes_multiplication(30), 60)
+        self.assertEqual(self.calls, ['notes_multiplication'])
+
+    def test_annotated_value_through_is_not_reused(self):
+        profile = Profile.objects.create(person=self.person, age=20)
+        self.count_calls('full_name')
+        profile = Profile.objects.annotate(Person.full_name(through='person')).get()
+        self.assertEqual(profile.full_name, 'Lautaro Redbear')
+        self.assertEqual(profile.person.full_name(), 'Lautaro Redbear')
+        self.assertEqual(self.calls, ['full_name'])
+
+    def test_memoized_until_a_field_changes(self):
+        self.count_calls('full_name')
+        self.assertEqual(self.person.full_name(), 'Lautaro Redbear')
+        self.assertEqual(self.person.full_name(), 'Lautaro Redbear')
+        self.assertEqual(len(self.calls), 1)
+        self.person.first_name = 'Gabriel'
+        self.assertEqual(self.person.full_name(), 'Gabriel Redbear')
+        self.assertEqual(len(self.calls), 2)
+        person = Person.objects.annotate(Person.full_name()).get()
+        person.last_name = 'Smith'
+        self.assertEqual(person.full_name(), 'Lautaro Smith')
+        self.assertEqual(len(self.calls), 3)
+
+    def test_hybrid_reading_a_relation_is_not_memoized(self):
+        profile = Profile.objects.create(person=self.person, age=20)
+        self.assertEqual(profile.person_first_name(), 'Lautaro')
+        profile.person.first_name = 'Gabriel'
+        self.assertEqual(profile.person_first_name(), 'Gabriel')
+        profile = Profile.objects.annotate(Profile.person_first_name()).get()
+        profile.person.first_name = 'Ana'
+        self.assertEqual(profile.person_first_name(), 'Ana')
+
+    def test_mutable_result_is_not_shared(self):
+        prop = Person.__dict__['total_notes']
+        with mock.patch.object(prop, 'func', lambda person: [person.first_note, person.second_note]):
+            notes = self.person.total_notes()
+            notes.append(3)
+            self.assertEqual(self.person.total_notes(), [1, 2])
+
+    def test_alias_named_after_another_hybrid(self):
+        (person,) = Person.objects.annotate(Person.total_notes(alias='full_name'))
+        self.assertEqual(person.total_notes(), 3)
+        self.assertEqual(person.full_name(), 'Lautaro Redbear')
+
+    def test_plain_annotation_does_not_rebind_hybrid(self):
+        person = Person.objects.annotate(full_name=models.F('first_name')).get()
+        self.assertEqual(person.full_name(), 'Lautaro Redbear')
+
+    def test_memoized_instance_pickles(self):
+        person = Person.objects.annotate(Person.notes_multiplication(10)).get()
+        self.assertEqual(person.full_name(), 'Lautaro Redbear')
+        self.count_calls('full_name')
+        self.count_calls('notes_multiplication')
+        restored = pickle.loads(pickle.dumps(person))
+        self.assertEqual(restored.full_name(), 'Lautaro Redbear')
+        self.assertEqual(restored.notes_multiplication(10), 20)
+        self.assertEqual(self.calls, [])
+
+
+class EvaluateManyTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        Person.objects.create(first_note=1, second_note=2, first_name='Lautaro', last_name='Redbear', datetime=now())
+        Person.objects.create(first_note=3, second_note=4, first_name='Gabriel', last_name='Smith', datetime=now())
+        self.people = list(Person.objects.order_by('pk'))
+        self.rows = list(Person.objects.order_by('pk').values())
+
+    def test_evaluate_many(self):
+        for objs in (self.people, self.rows):
+            self.assertEqual(Person.total_notes.evaluate_many(objs), [3, 7])
+            self.assertEqual(Person.notes_multiplication.evaluate_many(objs, 10), [20, 120])
+            self.assertEqual(Person.approved.evaluate_many(objs, 5), [False, True])
+            self.assertEqual(Person.full_name.evaluate_many(objs), ['Lautaro Redbear', 'Gabriel Smith'])
+        self.assertEqual(Person.total_notes.evaluate_many([]), [])
+
+    def test_evaluate_many_without_numpy(self):
+        with mock.patch('django_orm_hybrid.models.np', None):
+            self.assertEqual(Person.notes_multiplication.evaluate_many(self.people, 10), [20, 120])
+            self.assertEqual(Person.notes_multiplication.evaluate_many(self.rows, n=10), [20, 120])
+
+    def test_evaluate_many_returns_python_values(self):
+        self.assertIs(type(Person.total_notes.evaluate_many(self.people)[0]), int)
+
+    def test_evaluate_many_does_not_wrap(self):
+        people = [Person(first_note=2 ** 40, second_note=2 ** 30), Person(first_note=-2 ** 62, second_note=-2 ** 62)]
+        self.assertEqual(Person.notes_multiplication.evaluate_many(people[:1], 10), [2 ** 70 * 10])
+        self.assertEqual(Person.total_notes.evaluate_many(people[1:]), [-2 ** 63])
+        self.assertEqual(Person.total_notes.evaluate_many(people[:1]), [2 ** 40 + 2 ** 30])
+
+
+class InMemoryEvaluationTestCase(HybridTestCase):
+    def setUp(self):
+        super().setUp()
+        self.people = list(Person.objects.order_by('pk'))
+        self.profiles = list(Profile.objects.select_related('person').order_by('pk'))
+
+    def test_matches(self):
+        self.assertTrue((Person.total_notes() > 3).matches(self.person2))
+        self.assertFalse((Person.total_notes() > 3).matches(self.person1))
+        self.assertTrue((~Person.total_notes() > 3).matches(self.person1))
+        self.assertTrue(QQ(Person.full_name().icontains('redbear')).matches(self.person1))
+        self.assertTrue((Person.full_name(through='person') == 'Gabriel Smith').matches(self.profiles[1]))
+
+    def test_same_results_as_the_database(self):
+        predicates = [
+            Person.full_name() == 'Lautaro Redbear',
+            Person.full_name(ignore_case=True) == 'lautaro redbear',
+            Person.full_name().icontains('SMITH'),
+            Person.full_name().startswith('Gab'),
+            Person.full_name().iendswith('BEAR'),
+            Person.full_name().regex('^Lau*'),
+            Person.full_name().iregex('^lau*'),
+            Person.total_notes() > 3,
+            Person.total_notes().lte(3),
+            Person.total_notes().in_([3, 8]),
+            Person.total_notes().range([6, 8]),
+            Person.notes_multiplication(10) == 120,
+            Person.approved(5) == True,
+            Person.birth_datetime().year(self.person1.datetime.year.__str__()),
+            Person.birth_datetime().day(self.person1.datetime.day.__str__()),
+            Person.birth_datetime().date(self.person1.datetime.date().__str__()),
+            Person.birth_datetime().range([
+                self.person1.datetime.date().__str__(),
+                self.person2.datetime.date().__str__(),
+            ]),
+            QQ(Person.full_name() == 'Lautaro Redbear') | QQ(Person.total_notes() > 5),
+            QQ(Person.full_name() == 'Lautaro Redbear') & ~QQ(Person.total_notes() > 5),
+            QQ(Person.total_notes() > 0, first_name__icontains='GAB'),
+            models.Q(last_name__endswith='bear') | QQ(Person.notes_concat() == '3 - 4'),
+            models.Q(profile__age__gte=25),
+        ]
+        for predicate in predicates:
+            with self.subTest(predicate=predicate):
+                self.assertEqual(filter_in_memory(self.people, predicate), list(Person.objects.filter(predicate).order_by('pk')))
+                self.assertEqual(
+                    [obj for obj in self.people if not filter_in_memory([obj], predicate)],
+                    list(Person.objects.exclude(predicate).order_by('pk')),
+                )
+
+    def test_same_results_as_the_database_with_through(self):
+        predicates = [
+            Person.full_name(through='person').icontains('smith'),
+            Person.total_notes(through='person') > 3,
+            QQ(Person.total_notes(through='person') < 5) | QQ(age=30),
+        ]
+        for predicate in predicates:
+            with self.subTest(predicate=predicate):
+                self.assertEqual(filter_in_memory(self.profiles, predicate), list(Profile.objects.filter(predicate).order_by('pk')))
+
+    def test_filter_in_memory_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(filter_in_memory(self.profiles, Person.full_name(through='person').startswith('Lau'), age__lt=30), [self.profiles[0]])
+
+
+class StoredOrmPropertyTestCase(HybridTestCase):
+    def stored(self, column):
+        return dict(Person.objects.order_by('pk').values_list('first_name', column))
+
+    def test_receivers_connected_per_model(self):
+        self.assertTrue(pre_save.has_listeners(Person))
+        self.assertTrue(post_save.has_listeners(Person))
+        self.assertFalse(pre_save.has_listeners(Exam))
+        self.assertFalse(post_save.has_listeners(Exam))
+
+    def test_stored_columns(self):
+        display_name = Person._meta.get_field('display_name_stored')
+        self.assertEqual(display_name.max_length, 127)
+        notes_difference = Person._meta.get_field('notes_difference_stored')
+        self.assertIsInstance(notes_difference, models.IntegerField)
+        self.assertTrue(notes_difference.null)
+        self.assertTrue(notes_difference.db_index)
+        self.assertFalse(notes_difference.editable)
+        self.assertEqual(Person.__dict__['display_name'].sources, {'first_name', 'last_name'})
+
+    def test_save(self):
+        self.assertEqual(self.stored('display_name_stored'), {'Lautaro': 'Redbear, Lautaro', 'Gabriel': 'Smith, Gabriel'})
+        self.assertEqual(self.stored('notes_difference_stored'), {'Lautaro': 1, 'Gabriel': 1})
+        self.person1.last_name = 'Bluebear'
+        self.person1.save()
+        self.assertEqual(self.stored('display_name_stored')['Lautaro'], 'Bluebear, Lautaro')
+
+    def test_save_update_fields(self):
+        self.person1.last_name = 'Bluebear'
+        self.person1.second_note = 10
+        self.person1.save(update_fields=['last_name'])
+        self.assertEqual(self.stored('display_name_stored')['Lautaro'], 'Bluebear, Lautaro')
+        # second_note wasn't saved, neither is the hybrid reading it.
+        self.assertEqual(self.stored('notes_difference_stored')['Lautaro'], 1)
+
+    def test_queries_read_the_column(self):
+        queryset = Person.objects.filter(Person.display_name() == 'Smith, Gabriel')
+        self.assertIn('display_name_stored', str(queryset.query))
+        self.assertNotIn('CONCAT', str(queryset.query).upper())
+        self.assertEqual(list(queryset), [self.person2])
+        self.assertEqual(list(Profile.objects.filter(Person.notes_difference(through='person') == 1).order_by('pk').values_list('age', flat=True)), [20, 30])
+
+    def test_bulk_create(self):
+        Person.objects.bulk_create([
+            Person(first_note=1, second_note=7, first_name='Ana', last_name='Lopez', datetime=now()),
+        ])
+        self.assertEqual(self.stored('display_name_stored')['Ana'], 'Lopez, Ana')
+        self.assertEqual(self.stored('notes_difference_stored')['Ana'], 6)
+
+    def test_bulk_update(self):
+        self.person1.first_name = 'Lauti'
+        self.person2.first_note = 0
+        with CaptureQueriesContext(connection) as queries:
+            Person.objects.bulk_update([self.person1, self.person2], ['first_name'])
+        self.assertIn('display_name_stored', queries[0]['sql'])
+        self.assertNotIn('notes_difference_stored', queries[0]['sql'])
+        self.assertEqual(self.stored('display_name_stored'), {'Lauti': 'Redbear, Lauti', 'Gabriel': 'Smith, Gabriel'})
+
+    def test_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            Person.objects.filter(pk=self.person2.pk).update(first_note=models.F('second_note') * 2, last_name='Jones')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(self.stored('display_name_stored')['Gabriel'], 'Jones, Gabriel')
+        self.assertEqual(self.stored('notes_difference_stored'), {'Lautaro': 1, 'Gabriel': -4})
+
+    def test_update_without_sources(self):
+        with CaptureQueriesContext(connection) as queries:
+            Person.objects.update(datetime=now())
+        self.assertNotIn('stored', queries[0]['sql'])
+
+
+class HybridIndexTestCase(HybridTestCase):
+    def indexes(self):
+        return {index.name: index for index in Person._meta.indexes}
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' '.join(str(row) for row in cursor.fetchall())
+
+    def test_meta_indexes(self):
+        expressions = [index.expressions[0] for index in Person._meta.indexes]
+        self.assertIn(Person.total_notes()(), expressions)
+        self.assertIn(Lower(Person.full_name()()), expressions)
+        for name, index in self.indexes().items():
+            self.assertLessEqual(len(name), index.max_name_length)
+            path, _, _ = index.deconstruct()
+            self.assertEqual(path, 'django.db.models.Index')
+
+    def test_filter_uses_the_index(self):
+        index_name = next(name for name, index in self.indexes().items() if index.expressions[0] == Person.total_notes()())
+        queryset = Person.objects.filter(Person.total_notes() > 5)
+        self.assertIn(index_name, self.query_plan(queryset))
+        self.assertEqual(list(queryset), [self.person2])
+
+    def test_ignore_case_compares_lower(self):
+        queryset = Person.objects.filter(Person.full_name(ignore_case=True) == 'LAUTARO REDBEAR')
+        self.assertIn('LOWER(', str(queryset.query))
+        self.assertEqual(list(queryset), [self.person1])
+        self.assertEqual(list(Person.objects.filter(Person.full_name().iexact('gabriel smith'))), [self.person2])
+        self.assertEqual(list(Person.objects.exclude(Person.full_name().iexact('gabriel smith'))), [self.person1])
+        self.assertEqual(list(Person.objects.filter(Person.full_name().iexact(None))), [])
+
+    def test_check_warns_about_unindexed_filters(self):
+        with mock.patch('django_orm_hybrid.models._filtered_hybrids', set()):
+            list(Person.objects.filter(Person.total_notes() > 5, Person.full_name().iexact('gabriel smith')))
+            self.assertEqual(check_hybrid_indexes(), [])
+            list(Person.objects.filter(QQ(Person.notes_concat() == '3 - 4') | QQ(Person.notes_concat(ignore_case=True) == '1 - 2')))
+            self.assertEqual(
+                sorted(message.id for message in check_hybrid_indexes()),
+                ['django_orm_hybrid.W001', 'django_orm_hybrid.W002'],
+            )
+
+    def test_check_skips_hybrids_with_arguments(self):
+        with mock.patch('django_orm_hybrid.models._filtered_hybrids', set()):
+            list(Person.objects.filter(Person.notes_multiplication(2) > 5, Person.approved(3) == False))
+            self.assertEqual(check_hybrid_indexes(), [])
+
+    def test_check_ignores_lookups_an_index_cant_serve(self):
+        with mock.patch('django_orm_hybrid.models._filtered_hybrids', set()):
+            list(Person.objects.filter(Person.notes_concat().icontains('1')))
+            self.assertEqual(check_hybrid_indexes(), [])
+
+
+class InstrumentationTestCase(HybridTestCase):
+    def setUp(self):
+        super().setUp()
+        recorder.reset()
+        self.addCleanup(recorder.reset)
+
+    def test_disabled_by_default(self):
+        list(Person.objects.filter(Person.total_notes() > 0))
+        self.assertEqual(recorder.report(), [])
+
+    def test_records_per_hybrid_and_query_shape(self):
+        with recorder.recording():
+            list(Person.objects.filter(Person.total_notes() > 0).annotate(Person.full_name()))
+            list(Person.objects.filter(Person.total_notes() > 5))
+            list(Person.objects.filter(Person.total_notes() > 0))
+        stats = recorder.report('Person.total_notes')
+        self.assertEqual(len(stats), 2)
+        by_queries = sorted(stats, key=lambda s: s.queries)
+        self.assertEqual([s.queries for s in by_queries], [1, 2])
+        self.assertEqual(by_queries[1].rows, 3)
+        for s in stats:
+            self.assertIn('SELECT', s.sql)
+            self.assertGreater(s.compile_time, 0)
+            self.assertGreater(s.execute_time, 0)
+            self.assertEqual((s.annotations, s.joins), (1, 0))
+        self.assertEqual(len(recorder.report('Person.full_name')), 1)
+
+    def test_build_time_charged_once(self):
+        with recorder.recording():
+            queryset = Person.objects.filter(Person.total_notes() > 0)
+            list(queryset)
+            list(queryset.all())
+        (stats,) = recorder.report('Person.total_notes')
+        self.assertEqual(stats.queries, 2)
+        self.assertGreater(stats.build_time, 0)
+
+    def test_joins_and_arguments(self):
+        with override_settings(ORM_HYBRID_INSTRUMENTATION=True):
+            list(Profile.objects.filter(Person.notes_multiplication(10, through='person') > 0))
+        (stats,) = recorder.report()
+        self.assertEqual(stats.hybrid, 'Person.notes_multiplication')
+        self.assertEqual(stats.joins, 1)
+        self.assertEqual(stats.rows, 2)
+
+    def test_annotations_counted_per_hybrid(self):
+        with recorder.recording():
+            list(Person.objects.filter(Person.notes_multiplication(10) > 0).annotate(Person.notes_multiplication(20), Person.full_name()))
+        (stats,) = recorder.report('Person.notes_multiplication')
+        self.assertEqual(stats.annotations, 2)
+        (stats,) = recorder.report('Person.full_name')
+        self.assertEqual(stats.annotations, 1)
+
+    def test_unfetched_builds_stay_bounded(self):
+        with recorder.recording():
+            for n in range(20):
+                Person.objects.filter(Person.notes_multiplication(n) > 0).count()
+            self.assertEqual(list(recorder._pending()), ['Person.notes_multiplication'])
+            list(Person.objects.filter(Person.notes_multiplication(30) > 0))
+            self.assertEqual(recorder._pending(), {})
+
+    def test_explain_hybrid(self):
+        plan = Person.objects.filter(Person.total_notes() > 5).annotate(Person.full_name()).explain_hybrid()
+        self.assertIn('-- total_notes: Person.total_notes() [alias, 0 joins]', plan)
+        self.assertIn('-- full_name: Person.full_name() [select, 0 joins]', plan)
+        self.assertIn('<- Person.total_notes', plan)
+
+
+class OrderingTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.people = [
+            Person.objects.create(first_note=first_note, second_note=second_note, first_name=name, last_name='Smith', datetime=now())
+            for first_note, second_note, name in [(1, 2, 'Lautaro'), (3, 4, 'Gabriel'), (2, 1, 'Ana'), (0, 7, 'Lucia'), (5, 5, 'Martin')]
+        ]
+        # by total_notes desc, pk: Martin 10, Gabriel 7, Lucia 7, Lautaro 3, Ana 3
+        self.ranked = [self.people[4], self.people[1], self.people[3], self.people[0], self.people[2]]
+
+    def test_order_by_hybrid(self):
+        self.assertEqual(list(Person.objects.order_by(Person.total_notes().desc(), 'pk')), self.ranked)
+        self.assertEqual(list(Person.objects.order_by(Person.total_notes(), '-pk')), self.ranked[::-1])
+        self.assertEqual(list(Person.objects.order_by(Person.total_notes().desc(), 'pk').reverse()), self.ranked[::-1])
+        queryset = Person.objects.order_by(Person.full_name().asc(nulls_last=True))
+        self.assertEqual([person.first_name for person in queryset], ['Ana', 'Gabriel', 'Lautaro', 'Lucia', 'Martin'])
+
+    def test_order_by_reuses_the_filter_alias(self):
+        queryset = Person.objects.filter(Person.total_notes() > 3).order_by(Person.total_notes().desc(), 'pk')
+        self.assertNotIn('total_notes_2', queryset.query.annotations)
+        self.assertEqual(list(queryset), self.ranked[:3])
+        queryset = Profile.objects.order_by(Person.total_notes(through='person').desc())
+        self.assertIn('ORDER BY', str(queryset.query))
+
+    def test_paginate_after(self):
+        queryset = Person.objects.order_by(Person.total_notes().desc(), 'pk')
+        pages = []
+        page = list(queryset.paginate_after(None, 2))
+        while page:
+            pages.append(page)
+            page = list(queryset.paginate_after(page[-1], 2))
+        self.assertEqual(pages, [self.ranked[:2], self.ranked[2:4], self.ranked[4:]])
+        self.assertIn('OFFSET', str(queryset[2:4].query))
+        self.assertNotIn('OFFSET', str(queryset.paginate_after(self.ranked[1], 2).query))
+
+    def test_paginate_after_instance_costs_one_query(self):
+        for queryset in (
+            Person.objects.order_by(Person.total_notes().desc(), 'pk'),
+            Person.objects.annotate(Person.total_notes()).order_by(Person.total_notes().desc(), 'pk'),
+        ):
+            page = list(queryset.paginate_after(None, 2))
+            with self.assertNumQueries(1):
+                self.assertEqual(list(queryset.paginate_after(page[-1], 2)), self.ranked[2:4])
+        # A changed instance no longer trusts its memo, the database has the value
+        page[-1].first_note = 0
+        with self.assertNumQueries(2):
+            self.assertEqual(list(queryset.paginate_after(page[-1], 2)), self.ranked[2:4])
+
+    def test_paginate_after_values_row(self):
+        queryset = Person.objects.order_by(Person.total_notes().desc(), 'pk').values('pk', 'total_notes')
+        (last,) = queryset.filter(pk=self.ranked[1].pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                [row['pk'] for row in queryset.paginate_after(last)],
+                [person.pk for person in self.ranked[2:]],
+            )
+
+    def test_paginate_after_mixed_directions(self):
+        queryset = Person.objects.order_by(Person.total_notes().desc(), '-first_name', 'pk')
+        expected = list(queryset)
+        self.assertEqual(list(queryset.paginate_after(expected[1])), expected[2:])
+
+    def test_paginate_after_needs_the_pk(self):
+        with self.assertRaises(ValueError):
+            Person.objects.order_by(Person.total_notes().desc()).paginate_after(self.people[0])
+
+
+class AggregateTestCase(HybridTestCase):
+    def setUp(self):
+        super().setUp()
+        self.person3: Person = Person.objects.create(first_note=5, second_note=2, first_name='Ana', last_name='Lopez', datetime=now())
+
+    def test_aggregate(self):
+        with self.assertNumQueries(1):
+            result = Person.objects.aggregate(
+                Person.total_notes().sum(),
+                Person.total_notes().max(),
+                Person.total_notes().min(),
+                Person.total_notes().count(),
+                Person.total_notes().count_distinct(),
+                average=Person.total_notes().avg(),
+            )
+        self.assertEqual(result, {
+            'total_notes__sum': 17,
+            'total_notes__max': 7,
+            'total_notes__min': 3,
+            'total_notes__count': 3,
+            'total_notes__count_distinct': 2,
+            'average': 17 / 3,
+        })
+
+    def test_repeated_default_alias(self):
+        with self.assertRaises(ValueError):
+            Person.objects.aggregate(Person.total_notes().sum(), Person.total_notes(through='').sum())
+        with self.assertRaises(ValueError):
+            Person.objects.annotate(Person.notes_multiplication(1).sum(), Person.notes_multiplication(2).sum())
+
+    def test_aggregate_filtered_and_through(self):
+        self.assertEqual(
+            Person.objects.filter(Person.total_notes() > 3).aggregate(Person.notes_multiplication(2).sum()),
+            {'notes_multiplication__sum': 3 * 4 * 2 + 5 * 2 * 2},
+        )
+        self.assertEqual(
+            Profile.objects.aggregate(total=Person.total_notes(through='person').sum(), count=Person.full_name(through='person').count()),
+            {'total': 10, 'count': 2},
+        )
+
+    def test_group_by_hybrid(self):
+        queryset = Person.objects.values(Person.approved(5)).annotate(people=models.Count('pk')).order_by('approved')
+        self.assertEqual(list(queryset), [
+            {'approved': False, 'people': 1},
+            {'approved': True, 'people': 2},
+        ])
+        queryset = Person.objects.values_list(Person.total_notes()).annotate(Person.notes_multiplication(1).sum()).order_by('total_notes')
+        self.assertEqual(list(queryset), [(3, 2), (7, 12 + 10)])
+
+    def test_group_by_alias_of_filter(self):
+        queryset = Person.objects.filter(Person.total_notes() > 0).values(Person.total_notes()).annotate(people=models.Count('pk'))
+        self.assertEqual(sorted((row['total_notes'], row['people']) for row in queryset), [(3, 1), (7, 2)])
+        self.assertNotIn('total_notes_2', queryset.query.annotations)
+
+
+class AsyncTestCase(HybridTestCase):
+    async def test_async_methods(self):
+        queryset = Person.objects.filter(Person.total_notes() > 3)
+        self.assertEqual(await queryset.acount(), 1)
+        self.assertTrue(await queryset.aexists())
+        self.assertEqual(await Person.objects.aget(Person.full_name() == 'Lautaro Redbear'), self.person1)
+        self.assertEqual(await Person.objects.filter(first_note__lt=10).aget(QQ(Person.total_notes() > 3)), self.person2)
+        self.assertEqual(await Person.objects.aaggregate(Person.total_notes().sum()), {'total_notes__sum': 10})
+        self.assertEqual(await Profile.objects.aaggregate(total=Person.total_notes(through='person').max()), {'total': 7})
+
+    async def test_async_for(self):
+        queryset = Person.objects.exclude(Person.full_name().startswith('Gab')).annotate(Person.notes_multiplication(10))
+        people = [person async for person in queryset]
+        self.assertEqual(people, [self.person1])
+        self.assertEqual(people[0].notes_multiplication(10), 1 * 2 * 10)
+        names = [name async for name in Person.objects.order_by(Person.full_name()).values_list(Person.full_name(), flat=True)]
+        self.assertEqual(names, ['Gabriel Smith', 'Lautaro Redbear'])
+
+    async def test_apaginate_after(self):
+        queryset = Person.objects.order_by(Person.total_notes().desc(), 'pk')
+        first = [person async for person in await queryset.apaginate_after(None, 1)]
+        self.assertEqual(first, [self.person2])
+        second = [person async for person in await queryset.apaginate_after(first[-1], 1)]
+        self.assertEqual(second, [self.person1])
+
+    async def test_prepared_acall(self):
+        by_total = Person.objects.prepare(lambda queryset, n: queryset.filter(Person.total_notes() > n).order_by('pk'))
+        self.assertEqual(await by_total.acall(0), [self.person1, self.person2])
+        self.assertEqual(await by_total.acall(5), [self.person2])
+
+    async def test_aexplain_hybrid(self):
+        self.assertIn('-- total_notes:', await Person.objects.filter(Person.total_notes() > 3).aexplain_hybrid())
+
+
+class StreamTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.people = Person.objects.bulk_create([
+            Person(first_note=index, second_note=1, first_name=f'Name{index}', last_name='Smith', datetime=now())
+            for index in range(7)
+        ])
+
+    def test_stream(self):
+        rows = Person.objects.filter(Person.total_notes() > 2).order_by('pk').stream(Person.full_name(), Person.total_notes(), 'first_note', chunk_size=2)
+        rows = list(rows)
+        self.assertEqual(rows[0]._fields, ('full_name', 'total_notes', 'first_note'))
+        self.assertEqual([(row.full_name, row.total_notes) for row in rows], [(f'Name{index} Smith', index + 1) for index in range(2, 7)])
+
+    def test_stream_keyset(self):
+        queryset = Person.objects.exclude(first_note=0).stream(Person.full_name(), chunk_size=2, keyset=True)
+        # three full chunks and the empty one ending the stream
+        with self.assertNumQueries(4):
+            rows = list(queryset)
+        self.assertEqual([row.full_name for row in rows], [f'Name{index} Smith' for index in range(1, 7)])
+
+    def test_stream_keyset_by_hybrid(self):
+        queryset = Person.objects.order_by(Person.total_notes().desc(), 'pk').stream('first_name', chunk_size=3, keyset=True)
+        self.assertEqual([row.first_name for row in queryset], [f'Name{index}' for index in range(6, -1, -1)])
+
+    async def test_astream(self):
+        rows = [row async for row in Person.objects.filter(first_note__lt=2).order_by('pk').astream(Person.total_notes(), chunk_size=1)]
+        self.assertEqual([row.total_notes for row in rows], [1, 2])
+
+    def test_writers(self):
+        rows = Person.objects.filter(first_note__lt=2).order_by('pk').stream(Person.full_name(), Person.total_notes(), 'datetime')
+        output = io.StringIO()
+        self.assertEqual(write_csv(rows, output), 2)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], 'full_name,total_notes,datetime')
+        self.assertTrue(lines[1].startswith('Name0 Smith,1,'))
+
+        output = io.StringIO()
+        rows = Person.objects.filter(first_note__lt=2).order_by('pk').stream(Person.full_name(), Person.total_notes(), 'datetime')
+        self.assertEqual(write_ndjson(rows, output), 2)
+        first = json.loads(output.getvalue().splitlines()[0])
+        self.assertEqual((first['full_name'], first['total_notes']), ('Name0 Smith', 1))
+        self.assertIsInstance(first['datetime'], str)
+
+
+class UpdateExpressionTestCase(HybridTestCase):
+    def test_update_hybrid(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(Person.objects.filter(Person.total_notes() > 5).update(Person.total_notes().set(10)), 1)
+        self.person2.refresh_from_db()
+        self.assertEqual((self.person2.first_note, self.person2.second_note), (3, 7))
+        self.assertEqual(self.person2.total_notes(), 10)
+
+    def test_update_with_expression_and_fields(self):
+        Person.objects.update(Person.total_notes().set(models.F('first_note') * 3), last_name='Jones')
+        self.assertEqual(
+            list(Person.objects.order_by('pk').values_list('first_note', 'second_note', 'last_name', 'notes_difference_stored')),
+            [(1, 2, 'Jones', 1), (3, 6, 'Jones', 3)],
+        )
+
+    async def test_aupdate(self):
+        self.assertEqual(await Person.objects.aupdate(Person.total_notes().set(0)), 2)
+        self.assertEqual(await Person.objects.aaggregate(Person.total_notes().sum()), {'total_notes__sum': 0})
+
+    def test_invalid_assignments(self):
+        with self.assertRaises(ValueError):
+            Person.objects.update(Person.full_name().set('Ana Lopez'))
+        with self.assertRaises(ValueError):
+            Person.objects.update(Person.total_notes().set(1), second_note=5)
+        with self.assertRaises(ValueError):
+            Profile.objects.update(Person.total_notes(through='person').set(1))
+        with self.assertRaises(ValueError):
+            Person.objects.update(Person.total_notes() == 1)
+
+
+class ToManyThroughTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.person1: Person = Person.objects.create(first_note=1, second_note=2, first_name='Lautaro', last_name='Redbear', datetime=now())
+        self.profile1 = Profile.objects.create(person=self.person1, age=20)
+        self.person2: Person = Person.objects.create(first_note=3, second_note=4, first_name='Gabriel', last_name='Smith', datetime=now() + timedelta(days=5))
+        self.profile2 = Profile.objects.create(person=self.person2, age=30)
+        self.person3: Person = Person.objects.create(first_note=5, second_note=6, first_name='Ana', last_name='Lopez', datetime=now())
+        Exam.objects.bulk_create([
+            Exam(person=self.person1, score=6, bonus=1),
+            Exam(person=self.person1, score=8, bonus=0),
+            Exam(person=self.person1, score=2, bonus=0),
+            Exam(person=self.person2, score=3, bonus=1),
+        ])
+
+    def test_filter_uses_exists(self):
+        queryset = Person.objects.filter(Exam.final_score(through='exams') > 5)
+        sql = str(queryset.query)
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('JOIN', sql)
+        self.assertEqual(list(queryset), [self.person1])
+        self.assertEqual(list(Person.objects.filter(Exam.final_score(through='exams') < 5).order_by('pk')), [self.person1, self.person2])
+
+    def test_exclude(self):
+        queryset = Person.objects.exclude(Exam.final_score(through='exams') > 5).order_by('pk')
+        self.assertEqual(list(queryset), [self.person2, self.person3])
+        queryset = Person.objects.filter(~Exam.final_score(through='exams') > 5).order_by('pk')
+        self.assertEqual(list(queryset), [self.person2, self.person3])
+
+    def test_qq_and_nested_path(self):
+        queryset = Person.objects.filter(QQ(Exam.final_score(through='exams') == 4) | QQ(Person.total_notes() > 10)).order_by('pk')
+        self.assertEqual(list(queryset), [self.person2, self.person3])
+        queryset = Profile.objects.filter(Exam.final_score(through='person__exams') > 5, age__lt=30)
+        self.assertEqual(list(queryset), [self.profile1])
+        self.assertEqual(filter_in_memory(Profile.objects.order_by('pk'), Exam.final_score(through='person__exams') > 5), [self.profile1])
+
+    def test_annotate_aggregate_subquery(self):
+        queryset = Person.objects.annotate(
+            best=Exam.final_score(through='exams').max(),
+            taken=Exam.final_score(through='exams').count(),
+        ).order_by('pk')
+        self.assertNotIn('JOIN', str(queryset.query))
+        self.assertEqual([(person.best, person.taken) for person in queryset], [(8, 3), (4, 1), (None, 0)])
+        queryset = Person.objects.annotate(Exam.final_score(through='exams').sum()).filter(Person.total_notes() > 2).order_by('pk')
+        self.assertEqual([person.final_score__sum for person in queryset], [7 + 8 + 2, 4, None])
+
+    def test_annotate_or_order_by_plain_to_many_hybrid(self):
+        with self.assertRaises(ValueError):
+            Person.objects.annotate(Exam.final_score(through='exams'))
+        with self.assertRaisesMessage(ValueError, "order_by('-final_score__max')"):
+            Person.objects.order_by(Exam.final_score(through='exams').desc())
+        queryset = Person.objects.annotate(Exam.final_score(through='exams').max()).order_by(models.F('final_score__max').desc(nulls_last=True), 'pk')
+        self.assertEqual(list(queryset), [self.person1, self.person2, self.person3])
+
+
+class HybridPrefetchTestCase(HybridTestCase):
+    def setUp(self):
+        super().setUp()
+        Exam.objects.bulk_create([
+            Exam(person=self.person1, score=6, bonus=1),
+            Exam(person=self.person1, score=8),
+            Exam(person=self.person2, score=3, bonus=1),
+        ])
+
+    def not_computed_in_python(self, model, name):
+        return mock.patch.object(model.__dict__[name], 'func', side_effect=AssertionError(f'{name} computed in Python'))
+
+    def test_prefetch_reverse_fk(self):
+        with self.assertNumQueries(2):
+            people = list(Person.objects.order_by('pk').prefetch_related(HybridPrefetch('exams', hybrids=[Exam.final_score()])))
+        with self.assertNumQueries(0), self.not_computed_in_python(Exam, 'final_score'):
+            scores = [sorted(exam.final_score() for exam in person.exams.all()) for person in people]
+        self.assertEqual(scores, [[7, 8], [4]])
+
+    def test_prefetch_forward_with_queryset_and_to_attr(self):
+        prefetch = HybridPrefetch(
+            'person',
+            queryset=Person.objects.filter(Person.total_notes() > 5),
+            to_attr='passing_person',
+            hybrids=[Person.full_name(), Person.notes_multiplication(10)],
+        )
+        with self.assertNumQueries(2):
+            profiles = list(Profile.objects.order_by('pk').prefetch_related(prefetch))
+        self.assertIsNone(profiles[0].passing_person)
+        with self.assertNumQueries(0), self.not_computed_in_python(Person, 'full_name'), self.not_computed_in_python(Person, 'notes_multiplication'):
+            self.assertEqual(profiles[1].passing_person.full_name(), 'Gabriel Smith')
+            self.assertEqual(profiles[1].passing_person.notes_multiplication(10), 3 * 4 * 10)
+
+    def test_prefetch_plain_queryset(self):
+        prefetch = HybridPrefetch('exams', queryset=models.QuerySet(Exam).filter(score__gt=5), hybrids=[Exam.final_score()])
+        (person,) = Person.objects.filter(pk=self.person1.pk).prefetch_related(prefetch)
+        with self.not_computed_in_python(Exam, 'final_score'):
+            self.assertEqual(sorted(exam.final_score() for exam in person.exams.all()), [7, 8])
+
+    def test_invalid_hybrids(self):
+        with self.assertRaises(ValueError):
+            HybridPrefetch('person', hybrids=[Person.full_name(through='person')])
+        with self.assertRaises(ValueError):
+            HybridPrefetch('person', hybrids=[Person.full_name() == 'x'])
+
+
+class ImmutableExpressionTestCase(HybridTestCase):
+    def test_invert_returns_new_expression(self):
+        expression = Person.total_notes()
+        inverted = ~expression
+        self.assertEqual(expression.method, 'filter')
+        self.assertEqual(inverted.method, 'exclude')
+        self.assertEqual((~inverted).method, 'filter')
+
+    def test_reused_inverted_expression(self):
+        result = (~Person.full_name()).startswith('Laut')
+        for _ in range(2):
+            self.assertEqual(list(Person.objects.filter(result)), [self.person2])
+            self.assertEqual(list(Person.objects.exclude(result)), [self.person1])
+
+    def test_frozen(self):
+        expression = Person.total_notes(through='person')
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            expression.method = 'exclude'
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            (expression > 5).value = 10
+        self.assertEqual(expression.expr_kwargs, {'through': 'person__'})
+
+    def test_kwargs_not_mutated(self):
+        kwargs = {'through': 'person', 'alias': 'total'}
+        expression = Person.total_notes(**kwargs)
+        self.assertEqual(kwargs, {'through': 'person', 'alias': 'total'})
+        self.assertEqual(expression.alias, 'total')
+
+    def test_hash_by_value(self):
+        self.assertEqual(hash(Person.notes_multiplication(10)), hash(Person.notes_multiplication(10)))
+        self.assertNotEqual(hash(Person.notes_multiplication(10)), hash(~Person.notes_multiplication(10)))
+        results = {Person.total_notes() > 5: 'a', Person.full_name().iexact('x'): 'b'}
+        self.assertEqual(results[Person.total_notes() > 5], 'a')
+        self.assertEqual(results[Person.full_name().iexact('x')], 'b')
+        self.assertNotIn(Person.total_notes() > 6, results)
+
+    def test_cached_factory(self):
+        self.assertIs(Person.full_name, Person.full_name)
+        self.assertIs(Person.total_notes, Person.total_notes)
+
+    @skipIf(sys.version_info < (3, 10), "slotted dataclasses need Python 3.10")
+    def test_slots(self):
+        expression = Person.total_notes()
+        for node in (expression, expression > 5, expression.sum(), expression.asc(), expression.set(1)):
+            self.assertFalse(hasattr(node, '__dict__'), node)
+
+
+class PredicateCompositionTestCase(HybridTestCase):
+    def test_and_or(self):
+        people = Person.objects.order_by('pk')
+        self.assertEqual(list(people.filter((Person.total_notes() > 2) & Person.full_name().icontains('smith'))), [self.person2])
+        self.assertEqual(list(people.filter((Person.total_notes() > 5) | Person.full_name().startswith('Laut'))), [self.person1, self.person2])
+        self.assertEqual(list(people.filter((Person.total_notes() > 2) ^ Person.full_name().startswith('Laut'))), [self.person2])
+        self.assertEqual(list(people.exclude((Person.total_notes() > 2) & QQ(first_note=1))), [self.person2])
+
+    def test_combine_with_q(self):
+        people = Person.objects.order_by('pk')
+        self.assertEqual(list(people.filter((Person.total_notes() > 5) | QQ(first_name='Lautaro'))), [self.person1, self.person2])
+        self.assertEqual(list(people.filter(QQ(first_name='Gabriel') & (Person.total_notes() > 5))), [self.person2])
+
+    def test_invert(self):
+        result = Person.total_notes() > 5
+        self.assertEqual((~result).method, 'exclude')
+        self.assertEqual(result.method, 'filter')
+        self.assertEqual(list(Person.objects.filter(~result)), [self.person1])
+        self.assertEqual(list(Person.objects.filter(~result | QQ(first_note=3)).order_by('pk')), [self.person1, self.person2])
+        self.assertEqual(list(Person.objects.filter(QQ(~result))), [self.person1])
+
+    def test_single_where_without_selecting_hybrids(self):
+        queryset = Person.objects.filter((Person.total_notes() > 3) & Person.full_name().icontains('a'))
+        sql = str(queryset.query)
+        self.assertEqual(sql.count('WHERE'), 1)
+        self.assertNotIn('AS "total_notes"', sql)
+        self.assertNotIn('AS "full_name"', sql)
+        self.assertEqual(list(queryset), [self.person2])
+
+    def test_boolean_hybrid_condition(self):
+        queryset = Person.objects.filter(Person.approved(5) == True)
+        self.assertNotIn('CASE', str(queryset.query))
+        self.assertEqual(list(queryset), [self.person2])
+        self.assertEqual(list(Person.objects.exclude(Person.approved(5) == True)), [self.person1])
+        self.assertEqual(list(Profile.objects.filter(Person.approved(5, through='person') == True)), [Profile.objects.get(person=self.person2)])
+        self.assertEqual(list(Person.objects.filter(QQ(Person.approved(5) == True) | QQ(first_name='Lautaro')).order_by('pk')), [self.person1, self.person2])
+
+    def test_boolean_hybrid_condition_can_be_selected(self):
+        queryset = Person.objects.filter(Person.approved(5) == True)
+        self.assertEqual(list(queryset.values_list('approved', flat=True)), [True])
+        queryset = Person.objects.filter(QQ(Person.approved(5) == True) | QQ(first_name='Nobody'))
+        self.assertEqual(list(queryset.values_list('approved', flat=True)), [True])
+
+    def test_plain_q_combines_with_hybrid_result(self):
+        expected = [self.person2]
+        self.assertEqual(list(Person.objects.filter(models.Q(first_name='Gabriel') & (Person.total_notes() > 3))), expected)
+        self.assertEqual(list(Person.objects.filter(models.Q(first_name='Nobody') | ~(Person.total_notes() < 5))), expected)
+        self.assertEqual(list(Person.objects.filter(models.Q() & (Person.total_notes() > 3))), expected)
+        self.assertEqual(filter_in_memory([self.person1, self.person2], models.Q(first_name='Gabriel') & (Person.total_notes() > 3)), expected)
+
+    def test_negated_boolean_hybrid_keeps_case(self):
+        # The condition is NULL on every row, NOT(condition) would drop them all
+        self.assertEqual(list(Person.objects.filter(Person.approved(None) == True)), [])
+        for queryset in (
+            Person.objects.exclude(Person.approved(None) == True),
+            Person.objects.filter(~(Person.approved(None) == True)),
+            Person.objects.filter(~QQ(Person.approved(None) == True)),
+            Person.objects.exclude(QQ(Person.approved(None) == True) | QQ(first_name='Nobody')),
+        ):
+            self.assertIn('CASE', str(queryset.query))
+            self.assertEqual(list(queryset.order_by('pk')), [self.person1, self.person2])
+
+    def test_boolean_hybrid_else_value_keeps_case(self):
+        queryset = Person.objects.filter(Person.approved(5) == False)
+        self.assertIn('CASE', str(queryset.query))
+        self.assertEqual(list(queryset), [self.person1])
+
+    def test_in_memory(self):
+        predicate = (Person.total_notes() > 2) & ~Person.full_name().startswith('Laut')
+        self.assertEqual(filter_in_memory([self.person1, self.person2], predicate), [self.person2])
+
+
+class HybridRegistryTestCase(TestCase):
+    def test_populated_when_ready(self):
+        self.assertTrue(hybrid_registry.ready)
+        self.assertIn(Person, {info.model for info in hybrid_registry})
+
+    def test_for_model(self):
+        hybrids = hybrid_registry.for_model(Person)
+        self.assertIs(hybrid_registry.for_model(Person), hybrids)
+        self.assertIn('total_notes', hybrids)
+        self.assertIn('display_name', hybrids)
+        info = hybrids['notes_multiplication']
+        self.assertIs(info.orm_property, Person.__dict__['notes_multiplication'])
+        self.assertEqual(info.parameters, ('n',))
+        self.assertTrue(info.through)
+        self.assertTrue(hybrids['display_name'].orm_property.stored)
+        self.assertEqual(list(hybrid_registry.for_model(Exam)), ['final_score'])
+
+    def test_get(self):
+        self.assertEqual(hybrid_registry.get(Person, 'full_name').name, 'full_name')
+        with self.assertRaises(LookupError):
+            hybrid_registry.get(Person, 'first_name')
+
+    def test_bind(self):
+        info = hybrid_registry.get(Person, 'notes_multiplication')
+        self.assertEqual(info.bind(10, through='person__').arguments, {'n': 10, 'through': 'person__'})
+        with self.assertRaises(TypeError):
+            info.bind()
+
+    def test_documented_once(self):
+        registry = HybridRegistry()
+        registry.populate([Person])
+        self.assertEqual(Person.full_name.__doc__.count('**kwargs'), 1)
+        self.assertEqual(Person.__dict__['full_name'].expr.__doc__.count('**kwargs'), 1)
+
+    def test_check_missing_through(self):
+        def expression(cls):
+            return models.F('first_note')
+        prop = orm_property(lambda self: self.first_note).expression(expression)
+        prop.name = 'no_through'
+        model = type('NoThrough', (), {'no_through': prop, '__module__': __name__})
+        with mock.patch('django.apps.apps.get_models', return_value=[Person, model]):
+            messages = check_hybrid_signatures()
+        self.assertEqual([message.id for message in messages], ['django_orm_hybrid.W003'])
+        self.assertIs(messages[0].obj, model)
+
+
+@override_settings(ORM_HYBRID_RESULT_CACHE='default')
+class ResultCacheTestCase(HybridTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        Exam.objects.create(person=self.person1, score=6, bonus=1)
+
+    def leaderboard(self):
+        return Person.objects.annotate(Person.total_notes()).order_by(Person.total_notes().desc(), 'pk').cached(60)
+
+    def test_hit(self):
+        with self.assertNumQueries(1):
+            people = list(self.leaderboard())
+        with self.assertNumQueries(0), mock.patch.object(Person.__dict__['total_notes'], 'func', side_effect=AssertionError):
+            cached = list(self.leaderboard())
+            self.assertEqual([person.total_notes() for person in cached], [7, 3])
+        self.assertEqual(cached, people)
+        names = lambda: list(Person.objects.values_list(Person.full_name(), flat=True).order_by('pk').cached())
+        self.assertEqual(names(), ['Lautaro Redbear', 'Gabriel Smith'])
+        with self.assertNumQueries(0):
+            self.assertEqual(names(), ['Lautaro Redbear', 'Gabriel Smith'])
+
+    def test_fingerprint_includes_args(self):
+        self.assertEqual(list(Person.objects.filter(Person.notes_multiplication(1) > 5).cached()), [self.person2])
+        self.assertEqual(list(Person.objects.filter(Person.notes_multiplication(2) > 3).cached().order_by('pk')), [self.person1, self.person2])
+        self.assertEqual([profile.person_id for profile in Profile.objects.filter(Person.total_notes(through='person') > 5).cached()], [self.person2.pk])
+
+    def test_save_and_delete_invalidate(self):
+        list(self.leaderboard())
+        self.person1.first_note = 10
+        self.person1.save()
+        with self.assertNumQueries(1):
+            self.assertEqual([person.total_notes() for person in self.leaderboard()], [12, 7])
+        self.person2.delete()
+        self.assertEqual([person.total_notes() for person in self.leaderboard()], [12])
+
+    def test_queryset_writes_invalidate(self):
+        list(self.leaderboard())
+        Person.objects.filter(pk=self.person1.pk).update(first_note=10)
+        self.assertEqual([person.total_notes() for person in self.leaderboard()], [12, 7])
+        self.person2.second_note = 20
+        Person.objects.bulk_update([self.person2], ['second_note'])
+        self.assertEqual([person.total_notes() for person in self.leaderboard()], [23, 12])
+        Person.objects.bulk_create([Person(first_note=50, second_note=0, first_name='A', last_name='B', datetime=now())])
+        self.assertEqual([person.total_notes() for person in self.leaderboard()], [50, 23, 12])
+
+    def test_through_invalidated_by_related_model(self):
+        profiles = lambda: list(Profile.objects.filter(Person.total_notes(through='person') > 5).cached())
+        self.assertEqual([profile.age for profile in profiles()], [30])
+        Person.objects.filter(pk=self.person1.pk).update(first_note=10)
+        self.assertEqual(sorted(profile.age for profile in profiles()), [20, 30])
+
+    def test_to_many_subquery_invalidated(self):
+        people = lambda: list(Person.objects.filter(Exam.final_score(through='exams') > 6).cached())
+        self.assertEqual(people(), [self.person1])
+        with self.assertNumQueries(0):
+            people()
+        Exam.objects.update(score=1)
+        self.assertEqual(people(), [])
+
+    def test_queryset_delete_invalidates(self):
+        profiles = lambda: sorted(profile.age for profile in Profile.objects.filter(Person.total_notes(through='person') > 0).cached())
+        self.assertEqual(profiles(), [20, 30])
+        Person.objects.filter(pk=self.person2.pk).delete()
+        self.assertEqual(profiles(), [20])
+
+    def test_instance_delete_invalidates_the_whole_cascade(self):
+        certificate = Certificate.objects.create(person=self.person1, title='Math')
+        CertificateSignature.objects.create(certificate=certificate, signer='Ana')
+        signers = lambda: list(HybridQuerySet(CertificateSignature).values_list('signer', flat=True).cached())
+        self.assertEqual(signers(), ['Ana'])
+        self.person1.delete()
+        self.assertEqual(signers(), [])
+
+    def test_delete_receivers_per_model(self):
+        self.assertTrue(post_delete.has_listeners(Person))
+        # Models without an OrmManager keep Django's fast deletes
+        self.assertFalse(post_delete.has_listeners(Group))
+        with override_settings(ORM_HYBRID_RESULT_CACHE=None):
+            self.assertFalse(post_delete.has_listeners(Person))
+        self.assertTrue(post_delete.has_listeners(Person))
+
+    def test_invalidated_again_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Person.objects.filter(pk=self.person1.pk).update(first_note=10)
+            # Cached before the transaction commits, as a concurrent reader would
+            list(self.leaderboard())
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        with self.assertNumQueries(1):
+            list(self.leaderboard())
+
+    def test_unrelated_write_keeps_cache(self):
+        list(self.leaderboard())
+        Exam.objects.create(person=self.person2, score=1)
+        with self.assertNumQueries(0):
+            list(self.leaderboard())
+
+    def test_timeout(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            list(Person.objects.filter(Person.total_notes() > 5).cached(timeout=5))
+        self.assertEqual(cache_set.call_args.args[2], 5)
+
+    @override_settings(ORM_HYBRID_RESULT_CACHE=None)
+    def test_disabled(self):
+        with self.assertRaises(ImproperlyConfigured):
+            Person.objects.cached()
+
+
+class DependencyTrackingTestCase(HybridTestCase):
+    def test_inferred_dependencies(self):
+        self.assertEqual(hybrid_registry.get(Person, 'full_name').sources, {'first_name', 'last_name'})
+        self.assertEqual(hybrid_registry.get(Person, 'approved').sources, None)
+        self.assertEqual(Person.__dict__['approved']._dependencies(Person, (5,)), {'first_note', 'second_note'})
+        self.assertEqual(hybrid_registry.get(Exam, 'final_score').sources, {'score', 'bonus'})
+
+    def test_declared_dependencies(self):
+        prop = orm_property(lambda self: self.first_name, depends_on=['first_name', 'person_ptr']).expression(lambda cls, through='': models.F(f'{through}last_name'))
+        self.assertEqual(prop._dependencies(Person), {'first_name'})
+
+    def test_dependencies_table_is_bounded(self):
+        with mock.patch('django_orm_hybrid.models._DEPENDENCIES', OrderedDict()) as table, mock.patch('django_orm_hybrid.models._DEPENDENCIES_SIZE', 3):
+            approved = Person.__dict__['approved']
+            for n in range(10):
+                self.assertEqual(approved._dependencies(Person, (n,)), {'first_note', 'second_note'})
+            self.assertEqual(len(table), 3)
+            table.clear()
+            prop = orm_property(lambda self, n: self.first_name, depends_on=['first_name']).expression(lambda cls, n, through='': models.F(f'{through}last_name'))
+            for n in range(10):
+                prop._dependencies(Person, (n,))
+            self.assertEqual(len(table), 1)
+
+    def test_only_for(self):
+        with self.assertNumQueries(1):
+            people = list(Person.objects.only_for(Person.full_name, Person.total_notes).order_by('pk'))
+            self.assertEqual([(person.full_name(), person.total_notes()) for person in people], [('Lautaro Redbear', 3), ('Gabriel Smith', 7)])
+        self.assertEqual(people[0].get_deferred_fields(), {'datetime', 'display_name_stored', 'notes_difference_stored'})
+
+    def test_only_for_with_arguments(self):
+        with self.assertNumQueries(1):
+            (person,) = Person.objects.only_for(Person.notes_multiplication(10)).filter(pk=self.person2.pk)
+            self.assertEqual(person.notes_multiplication(10), 120)
+        with self.assertRaises(ValueError):
+            Person.objects.only_for(Person.notes_multiplication)
+        with self.assertRaises(ValueError):
+            Person.objects.only_for('first_name')
+        with self.assertRaises(ValueError):
+            Profile.objects.only_for(Person.full_name)
+
+    def test_only_and_defer_keep_sources(self):
+        people = Person.objects.only_for(Person.full_name).only('datetime').defer('first_name')
+        (person, _) = people.order_by('pk')
+        self.assertEqual(person.get_deferred_fields(), {'first_note', 'second_note', 'display_name_stored', 'notes_difference_stored'})
+        (person, _) = Person.objects.only('pk', Person.total_notes).order_by('pk')
+        self.assertEqual(person.get_deferred_fields(), {'first_name', 'last_name', 'datetime', 'display_name_stored', 'notes_difference_stored'})
+        self.assertEqual(Person.objects.only_for(Person.full_name).defer(None).get(pk=self.person1.pk).get_deferred_fields(), set())
+
+    def test_deferred_sources_loaded_once(self):
+        people = list(Person.objects.only('pk').order_by('pk'))
+        with self.assertNumQueries(2):
+            self.assertEqual([person.full_name() for person in people], ['Lautaro Redbear', 'Gabriel Smith'])
+        with self.assertNumQueries(0):
+            self.assertEqual([person.full_name() for person in people], ['Lautaro Redbear', 'Gabriel Smith'])
+        (person,) = Person.objects.only('pk').filter(pk=self.person2.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(person.approved(5), True)